@@ -0,0 +1,98 @@
+import os
+from concurrent.futures import Future
+from queue import Empty, SimpleQueue
+from threading import Lock, Thread
+from time import monotonic
+from typing import Callable, Sequence, Tuple
+
+from pandas import DataFrame
+
+
+class MicroBatcher:
+    """
+    Coalesces concurrent single-row predictions into batched forest passes.
+
+    Callers on any thread hand in one row and block until its result comes
+    back. A background thread waits for the first row, keeps collecting rows
+    for up to window seconds or max_rows rows, runs them as a single
+    Machine.predict_batch() call and hands each caller its own result. Under
+    concurrent load the per-call overhead (DataFrame construction, input
+    validation, joblib dispatch) is paid once per batch instead of per row.
+
+    Only useful when a worker serves requests concurrently (threaded workers).
+
+    Instance Attributes:
+    ---------
+    self.machines : Callable[[], Machine]
+        Returns the Machine to predict with, e.g. ModelRegistry.get.
+    self.window : float
+        The longest time, in seconds, a batch stays open for more rows.
+    self.max_rows : int
+        The batch size that closes a batch before its window ends.
+    self.batches : int
+        The number of batches run.
+    self.rows : int
+        The number of rows predicted.
+    """
+
+    def __init__(self, machines: Callable, window: float = 0.002, max_rows: int = 64) -> None:
+        self.machines = machines
+        self.window = window
+        self.max_rows = max_rows
+        self.batches = 0
+        self.rows = 0
+        self._queue = SimpleQueue()
+        self._lock = Lock()
+        self._thread = None
+        self._pid = None
+
+    def predict(self, row: Sequence[float]) -> Tuple:
+        """
+        Predicts one row, in the Machine's feature order, within a batch.
+
+        :param row: Sequence[float], the feature values, e.g. (level, health, energy, sanity).
+        :return: Tuple, of the predicted class code and the confidence.
+        """
+        future = Future()
+        self._start()
+        self._queue.put((row, future))
+        return future.result()
+
+    def _start(self) -> None:
+        # Start the batching thread on first use, and again in a forked child
+        if self._pid != os.getpid():
+            with self._lock:
+                if self._pid != os.getpid():
+                    self._queue = SimpleQueue()
+                    self._thread = Thread(target=self._run, name='micro-batcher', daemon=True)
+                    self._thread.start()
+                    self._pid = os.getpid()
+
+    def _run(self) -> None:
+        queue = self._queue
+        while True:
+            batch = [queue.get()]
+            deadline = monotonic() + self.window
+            while len(batch) < self.max_rows:
+                remaining = deadline - monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(queue.get(timeout=remaining))
+                except Empty:
+                    break
+            self._predict(batch)
+
+    def _predict(self, batch) -> None:
+        try:
+            machine = self.machines()
+            basis = DataFrame([row for row, _ in batch], columns=machine.feature_names)
+            predictions, confidences = machine.predict_batch(basis)
+        except Exception as error:
+            for _, future in batch:
+                future.set_exception(error)
+            return
+        self.batches += 1
+        self.rows += len(batch)
+        for (_, future), prediction, confidence in zip(batch, predictions, confidences):
+            future.set_result((prediction, confidence))
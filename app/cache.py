@@ -0,0 +1,284 @@
+from collections import OrderedDict
+from hashlib import sha256
+from threading import Lock
+from time import monotonic
+from typing import Callable, Hashable, Iterable, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+from pandas import DataFrame, __version__ as pandas_version, set_option
+
+# Snapshots are shared as shallow copies, which are only immutable under Copy-on-Write:
+# always on from pandas 3, turned on here for older versions
+if int(pandas_version.split('.')[0]) < 3:
+    set_option('mode.copy_on_write', True)
+
+
+class DatasetCache:
+    """
+    In-process cache of Monster dataframes shared by the routes.
+
+    A snapshot is keyed on the requested columns and stamped with the
+    Database.version() it was loaded at. As long as the version is unchanged
+    the snapshot is reused instead of reloading the collection.
+
+    Callers get a shallow copy of the snapshot: with pandas Copy-on-Write any
+    change they make to it (e.g. an inplace drop) is copied out, so the cached
+    snapshot itself stays immutable.
+
+    Each snapshot also records the Database.watermark() read just before it
+    was loaded, so it holds at least every Monster up to that watermark.
+
+    Instance Attributes:
+    ---------
+    self.maxsize : int
+        The maximum number of snapshots kept, the least recently used is evicted.
+    self.hits : int
+        The number of requests served from a snapshot.
+    self.misses : int
+        The number of requests that loaded the collection.
+    """
+
+    def __init__(self, maxsize: int = 8) -> None:
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._snapshots = OrderedDict()
+        self._lock = Lock()
+
+    def get(self, db, columns: Iterable[str]) -> DataFrame:
+        """
+        Returns the Monsters dataframe with the given columns, loading it
+        through db.dataframe() only when db.version() has changed.
+
+        :param db: Database, the interface to load the Monsters with.
+        :param columns: Iterable[str], the columns of the dataframe.
+        :return: DataFrame, a copy-on-write view of the snapshot.
+        """
+        return self.snapshot(db, columns)[0]
+
+    def snapshot(self, db, columns: Iterable[str]) -> Tuple[DataFrame, Optional[str]]:
+        """
+        Returns the Monsters dataframe with the given columns, as get() does,
+        with the watermark it was loaded at: every Monster up to the watermark
+        is in the dataframe (Monsters inserted while loading may be too).
+
+        :param db: Database, the interface to load the Monsters with.
+        :param columns: Iterable[str], the columns of the dataframe.
+        :return: Tuple, of a copy-on-write view of the snapshot and its watermark.
+        """
+        key = tuple(columns)
+        version = db.version()
+        with self._lock:
+            snapshot = self._snapshots.get(key)
+            if snapshot is not None and snapshot[0] == version:
+                self._snapshots.move_to_end(key)
+                self.hits += 1
+                return snapshot[1].copy(deep=False), snapshot[2]
+            self.misses += 1
+
+        # The version and the watermark are read before loading, so a write
+        # racing the load leaves a stale stamp and the next call reloads, and
+        # never puts a Monster missing from the dataframe under its watermark.
+        watermark = db.watermark()
+        df = db.dataframe(columns=list(key))
+        with self._lock:
+            self._snapshots[key] = (version, df, watermark)
+            self._snapshots.move_to_end(key)
+            while len(self._snapshots) > self.maxsize:
+                self._snapshots.popitem(last=False)
+        return df.copy(deep=False), watermark
+
+    def clear(self) -> None:
+        """
+        Drops every snapshot.
+
+        :return: None
+        """
+        with self._lock:
+            self._snapshots.clear()
+
+
+class PredictionCache:
+    """
+    In-process LRU cache of single-row predictions.
+
+    A prediction is keyed on the row's feature values, normalized to the
+    float32 values the forest compares, so inputs the model cannot tell
+    apart (e.g. 4 and 4.0) share an entry. Entries belong to one model
+    version: the first lookup with another version (a retrained or reloaded
+    model) drops every entry, so a new model never serves stale predictions.
+
+    Instance Attributes:
+    ---------
+    self.maxsize : int
+        The maximum number of predictions kept, the least recently used is evicted.
+    self.ttl : float
+        Seconds a prediction is served for, or None to keep it until evicted.
+    self.hits : int
+        The number of predictions served from the cache.
+    self.misses : int
+        The number of predictions computed.
+    """
+
+    def __init__(self, maxsize: int = 4096, ttl: Optional[float] = None) -> None:
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._version = None
+        self._predictions = OrderedDict()
+        self._lock = Lock()
+
+    def get(self, version: Hashable, row: Sequence[float], predict: Callable[[Sequence[float]], Tuple]) -> Tuple:
+        """
+        Returns the prediction of row by the model at version, calling
+        predict(row) only when it is not cached.
+
+        :param version: Hashable, the version of the model, e.g. ModelRegistry.version.
+        :param row: Sequence[float], the feature values in the model's feature order.
+        :param predict: Callable, predicts one row, e.g. Machine.predict_one.
+        :return: Tuple, of the predicted class code and the confidence.
+        """
+        key = tuple(np.asarray(row, dtype=np.float32).tolist())
+        now = monotonic()
+        with self._lock:
+            if version != self._version:
+                self._predictions.clear()
+                self._version = version
+            entry = self._predictions.get(key)
+            if entry is not None and (self.ttl is None or now - entry[0] < self.ttl):
+                self._predictions.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+
+        prediction = predict(row)
+        with self._lock:
+            if version == self._version:
+                self._predictions[key] = (now, prediction)
+                self._predictions.move_to_end(key)
+                while len(self._predictions) > self.maxsize:
+                    self._predictions.popitem(last=False)
+        return prediction
+
+    def stats(self) -> dict:
+        """
+        Returns the cache metrics: size, maxsize, ttl, hits, misses, hit_rate and version.
+
+        :return: dict, the metrics.
+        """
+        with self._lock:
+            requests = self.hits + self.misses
+            return {
+                "size": len(self._predictions),
+                "maxsize": self.maxsize,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / requests if requests else 0.0,
+                "version": self._version,
+            }
+
+    def clear(self) -> None:
+        """
+        Drops every prediction.
+
+        :return: None
+        """
+        with self._lock:
+            self._predictions.clear()
+
+
+class SpecCache:
+    """
+    In-process LRU cache of rendered chart specs, e.g. the Vega-Lite JSON
+    of every x/y/target combination of /view, or of their data (bytes).
+
+    A spec is keyed on its chart options and stamped with the dataset
+    version it was rendered from. Specs belong to one version: storing a
+    spec of a new version drops those of the previous one. Memory is bounded
+    by the number of specs and by their total size in bytes.
+
+    Each spec comes with an ETag, the hash of its content, which is the same
+    in every process rendering the same spec.
+
+    Instance Attributes:
+    ---------
+    self.maxsize : int
+        The maximum number of specs kept, the least recently used is evicted.
+    self.maxbytes : int
+        The maximum total size of the specs kept.
+    self.hits : int
+        The number of requests served from the cache.
+    self.misses : int
+        The number of specs rendered.
+    """
+
+    def __init__(self, maxsize: int = 256, maxbytes: int = 128 << 20) -> None:
+        self.maxsize = maxsize
+        self.maxbytes = maxbytes
+        self.hits = 0
+        self.misses = 0
+        self.nbytes = 0
+        self._version = None
+        self._warmed = None
+        self._specs = OrderedDict()
+        self._lock = Lock()
+
+    def get(self, key: Hashable, version: Hashable, render: Callable[[], Union[str, bytes]]) -> Tuple:
+        """
+        Returns the spec of key at version, calling render() only when it is not cached.
+
+        :param key: Hashable, the chart options, e.g. (x, y, target).
+        :param version: Hashable, the version of the data, e.g. Database.version().
+        :param render: Callable, renders the spec.
+        :return: Tuple, of the spec and its ETag.
+        """
+        with self._lock:
+            entry = self._specs.get(key)
+            if entry is not None and entry[0] == version:
+                self._specs.move_to_end(key)
+                self.hits += 1
+                return entry[1], entry[2]
+            self.misses += 1
+
+        spec = render()
+        etag = sha256(spec if isinstance(spec, bytes) else spec.encode()).hexdigest()[:16]
+        with self._lock:
+            if version != self._version:
+                self._specs.clear()
+                self.nbytes = 0
+                self._version = version
+            old = self._specs.pop(key, None)
+            if old is not None:
+                self.nbytes -= len(old[1])
+            self._specs[key] = (version, spec, etag)
+            self.nbytes += len(spec)
+            while self._specs and (len(self._specs) > self.maxsize or self.nbytes > self.maxbytes):
+                self.nbytes -= len(self._specs.popitem(last=False)[1][1])
+        return spec, etag
+
+    def warming(self, version: Hashable) -> bool:
+        """
+        Returns True the first time it is called for version, so a single
+        caller pre-renders the specs of each version of the data.
+
+        :param version: Hashable, the version of the data.
+        :return: bool, representing if the caller should pre-render.
+        """
+        with self._lock:
+            if version == self._warmed:
+                return False
+            self._warmed = version
+            return True
+
+    def clear(self) -> None:
+        """
+        Drops every spec.
+
+        :return: None
+        """
+        with self._lock:
+            self._specs.clear()
+            self.nbytes = 0
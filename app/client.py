@@ -0,0 +1,101 @@
+import atexit
+import logging
+import os
+from os import getenv
+from threading import Lock
+from typing import Dict, Optional
+
+from certifi import where
+from dotenv import load_dotenv
+from pymongo import MongoClient, timeout
+from pymongo.errors import PyMongoError
+
+# Load environmental variables once per process, not once per Database()
+load_dotenv()
+
+# Connection pool bounds for every client in this process
+MAX_POOL_SIZE = int(getenv("DB_MAX_POOL_SIZE", "10"))
+MIN_POOL_SIZE = int(getenv("DB_MIN_POOL_SIZE", "1"))
+
+# Seconds warm_up() waits for the server, so an unreachable one never holds up a worker's boot
+WARM_UP_TIMEOUT = float(getenv("DB_WARM_UP_TIMEOUT", "2.0"))
+
+_clients: Dict[Optional[str], MongoClient] = {}
+_lock = Lock()
+
+
+def get_client(url: str = None) -> MongoClient:
+    """
+    Returns the shared MongoClient of this process for the given url.
+
+    The first call for a url creates the client, later calls reuse it, so the
+    TLS handshake and the connection pool are paid once per process instead of
+    once per request. The client is created with connect=False, so nothing is
+    opened until the first operation (or warm_up()).
+
+    :param url: str, a MongoDB connection string. Defaults to the DB_URL environment variable.
+    :return: MongoClient, the pooled client for url.
+    """
+    if url is None:
+        url = getenv("DB_URL")
+    with _lock:
+        client = _clients.get(url)
+        if client is None:
+            client = MongoClient(
+                url,
+                tlsCAFile=where(),
+                maxPoolSize=MAX_POOL_SIZE,
+                minPoolSize=MIN_POOL_SIZE,
+                connect=False,
+            )
+            _clients[url] = client
+        return client
+
+
+def warm_up(url: str = None) -> bool:
+    """
+    Opens the shared client and round-trips a ping, so the first request of a
+    worker does not pay for server selection and the TLS handshake.
+
+    The ping gives up after WARM_UP_TIMEOUT seconds, instead of the client's
+    30 seconds of server selection, so a worker still starts quickly when the
+    server is down.
+
+    :param url: str, a MongoDB connection string. Defaults to the DB_URL environment variable.
+    :return: bool, representing if the server answered the ping.
+    """
+    try:
+        with timeout(WARM_UP_TIMEOUT):
+            get_client(url).admin.command("ping")
+    except PyMongoError as error:
+        logging.warning(f"MongoDB warm up failed: {error}")
+        return False
+    return True
+
+
+def close_clients() -> None:
+    """
+    Closes every shared client of this process and empties the registry.
+
+    :return: None
+    """
+    with _lock:
+        clients = list(_clients.values())
+        _clients.clear()
+    for client in clients:
+        client.close()
+
+
+def _after_fork() -> None:
+    """
+    MongoClient is not fork-safe. A forked child (e.g. a gunicorn worker)
+    forgets the clients inherited from its parent without closing them,
+    so it builds its own pool on first use.
+    """
+    global _lock
+    _lock = Lock()
+    _clients.clear()
+
+
+os.register_at_fork(after_in_child=_after_fork)
+atexit.register(close_clients)
@@ -1,12 +1,84 @@
-from os import getenv
-from typing import Dict, Iterable, Iterator
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from binascii import Error as Base64Error
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from itertools import islice
+from json import dumps, loads
+from multiprocessing import get_context
+from logging import debug, warning
+from os import cpu_count, getenv
+from threading import Lock, Thread
+from time import monotonic, sleep
+from typing import Callable, Dict, Iterable, Iterator, List, Optional
 # from random import randrange
 
-from certifi import where
-from dotenv import load_dotenv
+import numpy as np
+from bson import ObjectId
+from bson.errors import InvalidId
 from MonsterLab import Monster
 from pandas import DataFrame
-from pymongo import MongoClient
+from pymongo import ASCENDING, DESCENDING, DeleteOne, IndexModel, InsertOne, ReplaceOne, UpdateOne
+from pymongo.errors import BulkWriteError, ConnectionFailure, PyMongoError
+
+from app.client import get_client
+
+try:
+    from pymongoarrow.api import Schema, find_arrow_all
+except ImportError:  # the columnar loader is optional, dataframe() falls back to dicts
+    Schema = find_arrow_all = None
+
+# Fields a page of Monsters can be sorted and filtered on
+SORT_FIELDS = ("_id", "Name", "Type", "Level", "Rarity", "Health", "Energy", "Sanity")
+FILTER_FIELDS = ("Type", "Rarity")
+PAGE_SIZE = 25
+
+# Fields Monsters can be grouped on, and the numeric fields summarized, by the aggregation methods
+GROUP_FIELDS = ("Type", "Rarity", "Level")
+STAT_FIELDS = ("Level", "Health", "Energy", "Sanity")
+
+# Seconds between two probes of the collection for writes by other processes
+PROBE_INTERVAL = float(getenv("DB_PROBE_INTERVAL", "1.0"))
+
+# Seconds the cached count of Monsters is served before it is read again from the collection's metadata
+COUNT_TTL = float(getenv("DB_COUNT_TTL", "10.0"))
+
+# The number of write operations sent per round trip by bulk()
+BULK_BATCH = int(getenv("DB_BULK_BATCH", "1000"))
+
+# The number of Monsters generated and inserted at a time by seed()
+SEED_BATCH = int(getenv("DB_SEED_BATCH", "1000"))
+
+# Indexes of the Monsters collection, created by ensure_indexes():
+#  (field, _id) for every page sort field, which also serve equality filters on the field itself,
+#  and (Type, Rarity) for the combined filters of /data. Incremental reads go by _id, indexed by MongoDB.
+INDEXES = [
+    IndexModel([(field, ASCENDING), ("_id", ASCENDING)], name=f"{field}__id")
+    for field in SORT_FIELDS if field != "_id"
+] + [
+    IndexModel([("Type", ASCENDING), ("Rarity", ASCENDING)], name="Type_Rarity"),
+]
+
+# Field types of a Monster, used by the columnar loader
+SCHEMA = {
+    "Name": str,
+    "Type": str,
+    "Level": int,
+    "Rarity": str,
+    "Damage": str,
+    "Health": float,
+    "Energy": float,
+    "Sanity": float,
+    "Timestamp": str,
+}
+
+# Default dtypes of a Monster dataframe: categorical labels and float32 stats
+DTYPES = {
+    "Type": "category",
+    "Rarity": "category",
+    "Health": "float32",
+    "Energy": "float32",
+    "Sanity": "float32",
+}
 
 
 class Database:
@@ -20,12 +92,17 @@ class Database:
 
     Class Attributes:
     ---------
-    None
+    writes : int
+        The number of writes made through any Database of this process, or
+        seen on the change stream (see follow()). Part of version().
+    watching : bool
+        If a change stream follower is running (see follow()).
 
     Instance Attributes: (defined in __init__() )
     ---------
     self.client : MongoClient
-        A database driver for a MongoDB. The connection.
+        A database driver for a MongoDB. The connection, shared by every
+        Database instance of the process (see app.client.get_client).
     self.db : PyMongo Database (https://pymongo.readthedocs.io/en/stable/api/pymongo/database.html#pymongo.
     database.Database)
         A PyMongo Database object. The specific database.
@@ -36,7 +113,7 @@ class Database:
     Init and CRUD Methods:
     ---------
     __init__(self) -> None:
-        Initializes a PyMongo Connection, with instance objects: client, db, Collection
+        Attaches to the shared PyMongo Connection, with instance objects: client, db, Collection
     create_one(self, record: Dict = None) -> bool:
         CRUD method: creates a single Monster in the database.
     read_one(self, query: Dict = None) -> Dict:
@@ -48,43 +125,67 @@ class Database:
     create_many(self, records: Iterable[Dict]) -> bool:
         CRUD method: creates many record in the database using an iterable
         containing dictionary records.
-    read_many(self, query: Dict) -> Iterator[Dict]:
+    read_many(self, query: Dict, columns: Iterable[str] = None, limit: int = 0) -> Iterator[Dict]:
         CRUD method: reads many records from the database that match query.
     update_many(self, query: Dict, update: Dict) -> bool:
         CRUD method: updates many records that match query with update dictionary.
     delete_many(self, query: Dict) -> bool:
         CRUD method: deletes many records that match query.
+    bulk(self, operations, batch_size, ordered, retries) -> List[Dict]:
+        CRUD method: streams mixed write operations in batches, with retries and per-batch reports.
 
     Business logic methods:
     ---------
-    seed(self, amount: int):
-        Creates the input amount of Monsters in the database.
+    seed(self, amount, batch_size, workers, window, progress) -> bool:
+        Creates the input amount of Monsters in the database, in parallel batches.
     reset(self):
         Resets the database to be empty.
-    count(self) -> int:
-        Returns a count of the total objects in the database's current collection.
-    dataframe(self) -> DataFrame:
-        Returns a Pandas dataframe with all objects in the database's current collection.
-    html_table(self) -> str:
-        Returns a string containing a html table of all the Monsters
+    version(self) -> tuple:
+        Returns a token that changes whenever the collection's data changes.
+    follow(self) -> bool:
+        Follows the collection's change stream to track writes of other processes.
+    count(self, query) -> int:
+        Returns a count of the Monsters matching query, cached for the whole collection.
+    dataframe(self, columns, query, limit, dtypes) -> DataFrame:
+        Returns a typed Pandas dataframe of the Monsters matching query, with only the given columns.
+    columnar(self, columns, query, limit) -> DataFrame:
+        Returns a Pandas dataframe decoded from raw BSON batches into Arrow columns.
+    page(self, query, sort, descending, limit, after, before) -> Dict:
+        Returns one keyset paginated page of Monsters with next/prev cursors.
+    ensure_indexes(self) -> List[str]:
+        Creates the declared INDEXES of the collection that do not exist yet.
+    explain(self, query, sort, limit) -> Dict:
+        Returns the winning plan of a query, flagging collection scans.
+    groups(self, field, query, stats) -> List[Dict]:
+        Returns the number of Monsters, and the mean of stats, per value of field.
+    histogram(self, field, bins, boundaries, query) -> Dict:
+        Returns the number of Monsters per bin of a numeric field.
+    summary(self, fields, query) -> Dict:
+        Returns the count, and the min, max, mean and standard deviation of fields.
+    html_table(self, records: List[Dict] = None) -> str:
+        Returns a string containing a html table of one page of Monsters
         in the database's current collection.
     """
 
+    writes = 0
+    watching = False
+    _writes_lock = Lock()
+    _probe = (float("-inf"), None)
+    _count = (float("-inf"), None)
+
     def __init__(self) -> None:
         """
-        The init function creates a connection to the Atlas hosted database
-        using an environment file string. And also sets class variables for
+        The init function attaches to the Atlas hosted database through the
+        process-wide pooled client, so constructing a Database per request
+        costs no connection setup. And also sets class variables for
         the database 'db' and the Monster collection 'collection'
 
         :return: Database, an instance of the Database interface class
         with instance attributes.
         """
 
-        # Load environmental variables
-        load_dotenv()
-
-        # Create a connection to the MongoDB server
-        self.client = MongoClient(getenv("DB_URL"), tlsCAFile=where())
+        # Reuse the process-wide connection pool to the MongoDB server
+        self.client = get_client()
 
         # Select the database
         self.db = self.client['Database']
@@ -106,7 +207,9 @@ class Database:
         """
         if record is None:
             record = Monster().to_dict()
-        return self.collection.insert_one(record).acknowledged
+        result = self.collection.insert_one(record)
+        self._changed(1)
+        return result.acknowledged
 
     def read_one(self, query: Dict = None) -> Dict:
         """
@@ -142,7 +245,9 @@ class Database:
         :param update: Dict, the attributes to update.
         :return: bool, representing if the Monster was updated.
         """
-        return self.collection.update_one(query, {"$set": update}).acknowledged
+        result = self.collection.update_one(query, {"$set": update})
+        self._changed()
+        return result.acknowledged
 
     def delete_one(self, query: Dict) -> bool:
         """
@@ -151,7 +256,9 @@ class Database:
         :param query: Dict, the Monster attributes to find and delete a single Monster.
         :return: bool, representing if the Monster was deleted.
         """
-        return self.collection.delete_one(query).acknowledged
+        result = self.collection.delete_one(query)
+        self._changed(-result.deleted_count if result.acknowledged else None)
+        return result.acknowledged
 
     def create_many(self, records: Iterable[Dict]) -> bool:
         """
@@ -161,16 +268,26 @@ class Database:
         :param records: Iterable[Dict], Dicts of Monsters to create.
         :return: bool, representing if the Monsters were created.
         """
-        return self.collection.insert_many(records).acknowledged
+        result = self.collection.insert_many(records)
+        self._changed(len(result.inserted_ids))
+        return result.acknowledged
 
-    def read_many(self, query: Dict) -> Iterator[Dict]:
+    def read_many(self, query: Dict, columns: Iterable[str] = None, limit: int = 0) -> Iterator[Dict]:
         """
         CRUD method: reads many records from the database that match query.
 
+        When columns are given the projection is done by MongoDB, so the other
+        fields never cross the wire.
+
         :param query: Dict, Monster attributes to find matching Monsters.
-        :return: bool, representing if Monsters are found.
+        :param columns: Iterable[str], the fields to return. Defaults to all fields.
+        :param limit: int, the maximum number of records to return. 0 means no limit.
+        :return: Iterator[Dict], a cursor over the matching Monsters.
         """
-        return self.collection.find(query, {"_id": False})
+        projection = {"_id": False}
+        if columns is not None:
+            projection.update((column, True) for column in columns)
+        return self.collection.find(query, projection, limit=limit)
 
     def update_many(self, query: Dict, update: Dict) -> bool:
         """
@@ -180,7 +297,9 @@ class Database:
         :param update: Dict, the attribute changes to be made to matching Monsters.
         :return: bool, representing if the Monsters were updated.
         """
-        return self.collection.update_many(query, {"$set": update}).acknowledged
+        result = self.collection.update_many(query, {"$set": update})
+        self._changed()
+        return result.acknowledged
 
     def delete_many(self, query: Dict) -> bool:
         """
@@ -190,17 +309,167 @@ class Database:
         from the database.
         :return: bool, representing if the objects were deleted successfully.
         """
-        return self.collection.delete_many(query).acknowledged
+        result = self.collection.delete_many(query)
+        self._changed(-result.deleted_count if result.acknowledged else None)
+        return result.acknowledged
+
+    def bulk(self,
+             operations: Iterable,
+             batch_size: int = BULK_BATCH,
+             ordered: bool = True,
+             retries: int = 2) -> List[Dict]:
+        """
+        CRUD method: streams mixed write operations to the database in
+        batches, one bulk_write round trip per batch.
+
+        Operations are pymongo write models (InsertOne, UpdateOne, UpdateMany,
+        ReplaceOne, DeleteOne, DeleteMany) from any iterable, e.g. a generator
+        over an import file: only one batch of them is held at a time.
+
+        Writes are delivered at least once. The driver's retryable writes
+        already resend a single-document write once, exactly once on the
+        server. Past that, a connection error can arrive after the server
+        applied part or all of the batch, so a batch is only sent again (up
+        to retries times, with an exponential backoff) when repeating it is
+        harmless: every operation is an InsertOne, a ReplaceOne, an upserting
+        UpdateOne or a DeleteOne. Inserts already applied by a failed attempt
+        are left out of the next one, they keep the _id the driver gave them.
+        Any other batch, or one still failing after retries, raises the error.
+        The report of a resent batch counts the writes of its last attempt,
+        plus the inserts already applied.
+
+        A batch with failed writes (e.g. a duplicate key) is not retried, its
+        errors are counted in its report. Ordered writes stop at the first
+        failed write, as bulk_write does; unordered writes carry on with the
+        other operations and batches.
+
+        :param operations: Iterable, the pymongo write models to apply.
+        :param batch_size: int, the number of operations per bulk_write.
+        :param ordered: bool, apply the operations in order, stopping at the first error.
+        :param retries: int, the number of times a batch is sent again after a connection error.
+        :return: List[Dict], one report per batch sent, with keys batch, operations,
+            inserted, matched, modified, deleted, upserted, errors, attempts and seconds.
+        """
+        operations = iter(operations)
+        reports = []
+        while True:
+            batch = list(islice(operations, batch_size))
+            if not batch:
+                return reports
+            start = monotonic()
+            pending, applied = batch, 0
+            for attempt in range(1, retries + 2):
+                try:
+                    if attempt > 1:
+                        pending, already = self._unapplied(pending)
+                        applied += already
+                    result = self.collection.bulk_write(pending, ordered=ordered)
+                except BulkWriteError as error:
+                    counts, errors = error.details, len(error.details.get("writeErrors", ()))
+                    break
+                except ConnectionFailure:
+                    if attempt > retries or not all(_resendable(operation) for operation in batch):
+                        self._changed(None)
+                        raise
+                    sleep(0.1 * 2 ** (attempt - 1))
+                else:
+                    counts, errors = result.bulk_api_result, 0
+                    break
+            # A failed attempt may have applied writes the counts miss, the cached count is read again
+            self._changed(None if attempt > 1 else
+                          counts.get("nInserted", 0) + counts.get("nUpserted", 0) - counts.get("nRemoved", 0))
+            reports.append({
+                "batch": len(reports),
+                "operations": len(batch),
+                "inserted": counts.get("nInserted", 0) + applied,
+                "matched": counts.get("nMatched", 0),
+                "modified": counts.get("nModified", 0),
+                "deleted": counts.get("nRemoved", 0),
+                "upserted": counts.get("nUpserted", 0),
+                "errors": errors,
+                "attempts": attempt,
+                "seconds": monotonic() - start,
+            })
+            if errors and ordered:
+                return reports
+
+    def _unapplied(self, operations: List) -> tuple:
+        """
+        Leaves out the InsertOne operations whose document is already in the
+        collection, i.e. applied by a failed attempt.
 
-    def seed(self, amount: int):
+        :param operations: List, the pymongo write models of a batch.
+        :return: tuple, of the operations left and the number left out.
+        """
+        # pymongo write models keep their document private, the driver set its _id on the first attempt
+        ids = [operation._doc["_id"] for operation in operations
+               if isinstance(operation, InsertOne) and "_id" in operation._doc]
+        if not ids:
+            return operations, 0
+        existing = {record["_id"] for record in self.collection.find({"_id": {"$in": ids}}, {"_id": True})}
+        left = [operation for operation in operations
+                if not (isinstance(operation, InsertOne) and operation._doc.get("_id") in existing)]
+        return left, len(operations) - len(left)
+
+    def seed(self,
+             amount: int,
+             batch_size: int = SEED_BATCH,
+             workers: Optional[int] = None,
+             window: int = 4,
+             progress: Callable[[int, float], None] = None) -> bool:
         """
         Creates the input amount of Monsters in the database.
 
+        The Monsters are generated batch_size at a time across a pool of
+        worker processes, and each batch is inserted as soon as it is ready
+        with an unordered insert_many, up to window inserts at a time. At most
+        window batches are generated ahead and window are being inserted, so
+        memory is bounded by the window whatever the amount. Small amounts
+        (a single batch), or no workers, generate the Monsters in this process,
+        next to the inserts.
+
         :param amount: int, the desired number of Monsters to create in the database.
+        :param batch_size: int, the number of Monsters per insert.
+        :param workers: int, the number of generating processes. Defaults to one per core
+            but one, which is left to the inserts.
+        :param window: int, the number of batches generated ahead, and inserted at a time.
+        :param progress: Callable, called after each insert with the number of Monsters
+            inserted so far and the seconds elapsed.
         :return: bool, representing if the objects were created successfully.
         """
-        records = [Monster().to_dict() for _ in range(amount)]
-        return self.create_many(records)
+        sizes = deque(min(batch_size, amount - offset) for offset in range(0, amount, batch_size))
+        if workers is None:
+            workers = (cpu_count() or 1) - 1
+        inline = workers < 1 or len(sizes) <= 1
+        generator = None if inline else ProcessPoolExecutor(workers, mp_context=get_context("spawn"))
+        inserter = ThreadPoolExecutor(window, thread_name_prefix="seed")
+        generating, inserting = deque(), set()
+        acknowledged, inserted, start = True, 0, monotonic()
+        try:
+            while sizes or generating or inserting:
+                while sizes and len(generating) < window:
+                    size = sizes.popleft()
+                    generating.append(generator.submit(_monsters, size) if generator else _done(_monsters(size)))
+                if generating and len(inserting) < window:
+                    records = generating.popleft().result()
+                    inserting.add(inserter.submit(self.collection.insert_many, records, ordered=False))
+                    continue
+                done, inserting = wait(inserting, return_when=FIRST_COMPLETED)
+                for future in done:
+                    result = future.result()
+                    acknowledged = acknowledged and result.acknowledged
+                    inserted += len(result.inserted_ids)
+                    self._changed(len(result.inserted_ids))
+                    if progress is not None:
+                        progress(inserted, monotonic() - start)
+        finally:
+            # Cancel the batches still waiting to be generated by hand (shutdown's cancel_futures is Python 3.9+)
+            for future in generating:
+                future.cancel()
+            inserter.shutdown()
+            if generator is not None:
+                generator.shutdown()
+        return acknowledged
 
     def reset(self):
         """
@@ -211,39 +480,545 @@ class Database:
         records = {}
         return self.delete_many(records)
 
-    def count(self) -> int:
+    def version(self) -> tuple:
+        """
+        Returns a token that changes whenever the collection's data changes,
+        so cached data can be reused for as long as it is equal.
+
+        Writes of this process bump Database.writes. Writes of other processes
+        are seen through the change stream when follow() is running, otherwise
+        through a cheap probe of the estimated count and newest _id, taken at
+        most every PROBE_INTERVAL seconds. The probe misses in place updates
+        made by other processes.
+
+        :return: tuple, the version token.
+        """
+        if Database.watching:
+            return Database.writes,
+        checked, probe = Database._probe
+        now = monotonic()
+        if now - checked >= PROBE_INTERVAL:
+            newest = self.collection.find_one({}, {"_id": True}, sort=[("_id", DESCENDING)])
+            probe = self.collection.estimated_document_count(), newest and newest["_id"]
+            Database._probe = now, probe
+            Database._count = now, probe[0]
+        return Database.writes, probe
+
+    def watermark(self) -> Optional[str]:
         """
-        Returns a count of the total objects in the database's current collection.
+        Returns the _id of the newest Monster, as a high-water mark for reading
+        only the Monsters inserted after it (see since()).
 
+        :return: str, the newest _id, or None for an empty collection.
+        """
+        newest = self.collection.find_one({}, {"_id": True}, sort=[("_id", DESCENDING)])
+        return str(newest["_id"]) if newest else None
+
+    @staticmethod
+    def since(after: Optional[str], until: Optional[str] = None) -> Dict:
+        """
+        Builds the query matching the Monsters inserted after the watermark
+        after, up to and including the watermark until. ObjectIds grow with
+        their creation time, so this reads an insert-only collection in
+        increments; updates and deletes of older Monsters are not seen.
+
+        :param after: str, an earlier watermark(). None matches from the start.
+        :param until: str, a later watermark(). None matches to the end.
+        :return: Dict, the query.
+        """
+        bounds = {}
+        if after is not None:
+            bounds["$gt"] = ObjectId(after)
+        if until is not None:
+            bounds["$lte"] = ObjectId(until)
+        return {"_id": bounds} if bounds else {}
+
+    def follow(self) -> bool:
+        """
+        Starts a daemon thread following the collection's change stream, which
+        bumps Database.writes on every change made by any process. Change
+        streams need a replica set (Atlas clusters are), when unavailable
+        version() keeps probing.
+
+        :return: bool, representing if the change stream is followed.
+        """
+        with Database._writes_lock:
+            if Database.watching:
+                return True
+            try:
+                stream = self.collection.watch()
+            except PyMongoError as error:
+                warning(f"Cannot follow the Monsters change stream: {error}")
+                return False
+            Database.watching = True
+        Thread(target=self._follow, args=(stream,), daemon=True).start()
+        return True
+
+    def _follow(self, stream) -> None:
+        try:
+            with stream:
+                for change in stream:
+                    self._changed(_count_change(change), followed=True)
+        except PyMongoError as error:
+            warning(f"Stopped following the Monsters change stream: {error}")
+        finally:
+            Database.watching = False
+            self._changed(None)
+
+    def _changed(self, delta: Optional[int] = 0, followed: bool = False) -> None:
+        # Bump the writes, and move the cached count by the number of Monsters the write added (or removed).
+        # An unknown delta drops the cached count. While the change stream is followed, it reports
+        # every write, this process' included, so only its deltas are counted.
+        with Database._writes_lock:
+            Database.writes += 1
+            if followed or not Database.watching:
+                checked, count = Database._count
+                if delta is None or count is None:
+                    Database._count = float("-inf"), None
+                else:
+                    Database._count = checked, count + delta
+
+    def count(self, query: Dict = None) -> int:
+        """
+        Returns a count of the Monsters matching query.
+
+        The count of the whole collection is served from a process-wide cache:
+        it is read from the collection's metadata (estimated_document_count,
+        no scan) at most every COUNT_TTL seconds, and in between moved by the
+        Monsters each write of this process adds or removes, or by every
+        change of the change stream when follow() is running. Writes of other
+        processes are otherwise seen within COUNT_TTL seconds.
+
+        A filtered count is counted by the server with count_documents, over
+        the Type and Rarity indexes (see INDEXES) for the FILTER_FIELDS.
+
+        :param query: Dict, Monster attributes to filter on. Defaults to all Monsters.
         :return: int, count of Monsters.
         """
-        query = {}
-        count = self.collection.count_documents(query)  # {} means no filter, so it counts all documents
-        print(f'There are {count} documents in the collection.')
+        if query:
+            return self.collection.count_documents(query)
+        checked, count = Database._count
+        now = monotonic()
+        if count is None or now - checked >= COUNT_TTL:
+            count = self.collection.estimated_document_count()
+            with Database._writes_lock:
+                Database._count = now, count
+            debug(f"There are {count} documents in the collection.")
         return count
 
-    def dataframe(self) -> DataFrame:
+    def dataframe(self,
+                  columns: List[str] = None,
+                  query: Dict = None,
+                  limit: int = 0,
+                  dtypes: Dict[str, str] = None) -> DataFrame:
         """
-        Returns a Pandas dataframe with all objects in the database's current collection.
+        Returns a Pandas dataframe with the Monsters in the database's current
+        collection matching query.
 
+        Only the requested columns are fetched from MongoDB. The frame is typed
+        with dtypes, by default categorical Type/Rarity and float32 stats (see
+        DTYPES), which keeps its memory a fraction of an all-object frame.
+
+        When pymongoarrow is installed and the requested columns are all in
+        SCHEMA, the raw BSON batches of the cursor are decoded straight into
+        Arrow column buffers (see columnar()), without building a dict per
+        Monster. Otherwise, and always for all fields (columns=None), so no
+        field is dropped, the records are read as dicts through read_many().
+
+        :param columns: List[str], the columns to load. Defaults to all fields.
+        :param query: Dict, Monster attributes to filter on. Defaults to all Monsters.
+        :param limit: int, the maximum number of rows. 0 means no limit.
+        :param dtypes: Dict[str, str], column to dtype hints. Defaults to DTYPES.
         :return: Pandas DataFrame object, of Monsters.
         """
-        query = {}
-        df = DataFrame(list(self.read_many(query)))
+        if query is None:
+            query = {}
+        if dtypes is None:
+            dtypes = DTYPES
+        if find_arrow_all is not None and columns is not None and all(column in SCHEMA for column in columns):
+            df = self.columnar(columns, query, limit)
+        else:
+            df = DataFrame(list(self.read_many(query, columns, limit)), columns=columns)
+        df = df.astype({column: dtype for column, dtype in dtypes.items() if column in df.columns})
         return df
 
-    def html_table(self) -> str:
+    def chunks(self,
+               columns: List[str] = None,
+               query: Dict = None,
+               size: int = 10_000,
+               dtypes: Dict[str, str] = None) -> Iterator[DataFrame]:
+        """
+        Yields the Monsters matching query as consecutive dataframes of at
+        most size rows, typed like dataframe(). They are read from a single
+        cursor through read_many(), fetched size documents per round trip,
+        so however big the collection only one chunk is held at a time.
+
+        :param columns: List[str], the columns to load. Defaults to all fields.
+        :param query: Dict, Monster attributes to filter on. Defaults to all Monsters.
+        :param size: int, the number of rows per chunk.
+        :param dtypes: Dict[str, str], column to dtype hints. Defaults to DTYPES.
+        :return: Iterator[DataFrame], the chunks of Monsters.
+        """
+        if dtypes is None:
+            dtypes = DTYPES
+        records = self.read_many(query or {}, columns).batch_size(size)
+        while True:
+            chunk = list(islice(records, size))
+            if not chunk:
+                return
+            df = DataFrame(chunk, columns=columns)
+            yield df.astype({column: dtype for column, dtype in dtypes.items() if column in df.columns})
+
+    def columnar(self, columns: List[str] = None, query: Dict = None, limit: int = 0) -> DataFrame:
+        """
+        Returns an untyped Pandas dataframe of the Monsters matching query,
+        decoded column by column with pymongoarrow.
+
+        The cursor's raw BSON batches go straight into Arrow buffers typed by
+        SCHEMA; values that are missing or do not match SCHEMA become nulls.
+        Fields outside SCHEMA are not loaded.
+
+        :param columns: List[str], the columns to load. Defaults to all SCHEMA fields.
+        :param query: Dict, Monster attributes to filter on. Defaults to all Monsters.
+        :param limit: int, the maximum number of rows. 0 means no limit.
+        :return: Pandas DataFrame object, of Monsters.
+        """
+        if find_arrow_all is None:
+            raise ImportError("Database.columnar() requires pymongoarrow")
+        schema = Schema({column: SCHEMA[column] for column in columns or SCHEMA})
+        table = find_arrow_all(self.collection, query or {}, schema=schema, allow_invalid=True, limit=limit)
+        return table.to_pandas()
+
+    def page(self,
+             query: Dict = None,
+             sort: str = "_id",
+             descending: bool = False,
+             limit: int = PAGE_SIZE,
+             after: str = None,
+             before: str = None) -> Dict:
         """
-        Returns a string containing a html table of all the Monsters
+        Returns one page of Monsters matching query, sorted on sort.
+
+        Pages use keyset (cursor) pagination: instead of skipping over the
+        previous pages, each page resumes strictly after (or before) the
+        (sort value, _id) of the row it was reached from. With an index on
+        (sort, _id) the cost of a page is the same however deep it is and
+        however many Monsters there are. Ties on sort are broken by _id so
+        the key is unique.
+
+        :param query: Dict, Monster attributes to filter on.
+        :param sort: str, one of SORT_FIELDS to order the Monsters by.
+        :param descending: bool, sort from the highest to the lowest value.
+        :param limit: int, the maximum number of Monsters on the page.
+        :param after: str, a "next" cursor of a previous page.
+        :param before: str, a "prev" cursor of a previous page.
+        :return: Dict, with keys "records" (List[Dict] of Monsters), "next" and
+        "prev" (str cursors, or None on the last/first page).
+        """
+        if sort not in SORT_FIELDS:
+            raise ValueError(f"Cannot sort Monsters on {sort!r}")
+        forward = before is None
+        direction = DESCENDING if descending == forward else ASCENDING
+        query = dict(query or {})
+
+        token = after if forward else before
+        if token is not None:
+            value, _id = _decode_cursor(token)
+            keyset = _keyset(sort, value, _id, direction)
+            query = {"$and": [query, keyset]} if query else keyset
+
+        keys = [(sort, direction)]
+        if sort != "_id":
+            keys.append(("_id", direction))
+        records = list(self.collection.find(query).sort(keys).limit(limit + 1))
+        more = len(records) > limit
+        records = records[:limit]
+        if not forward:
+            records.reverse()
+
+        has_next = more if forward else True
+        has_prev = after is not None if forward else more
+        page = {
+            "next": _encode_cursor(records[-1], sort) if records and has_next else None,
+            "prev": _encode_cursor(records[0], sort) if records and has_prev else None,
+        }
+        for record in records:
+            del record["_id"]
+        page["records"] = records
+        return page
+
+    def ensure_indexes(self) -> List[str]:
+        """
+        Creates the INDEXES of the collection that do not exist yet. Existing
+        indexes are left as they are, so it is cheap to call at every startup.
+
+        :return: List[str], the names of the indexes, or an empty list when the server is unreachable.
+        """
+        try:
+            return self.collection.create_indexes(INDEXES)
+        except PyMongoError as error:
+            warning(f"Cannot create the Monsters indexes: {error}")
+            return []
+
+    def explain(self, query: Dict = None, sort: List = None, limit: int = 0) -> Dict:
+        """
+        Returns how MongoDB runs a query: the stages of its winning plan, the
+        indexes it uses, and how many index keys and documents it examined.
+        collscan flags a query that reads the whole collection, e.g. for a
+        test to assert that a query is indexed.
+
+        :param query: Dict, Monster attributes to filter on. Defaults to all Monsters.
+        :param sort: List, (field, direction) pairs to sort on.
+        :param limit: int, the maximum number of records. 0 means no limit.
+        :return: Dict, with keys stages, indexes, collscan, keys_examined, docs_examined and millis.
+        """
+        cursor = self.collection.find(query or {}, limit=limit)
+        if sort:
+            cursor = cursor.sort(sort)
+        plan = cursor.explain()
+        stages, indexes = [], []
+        _walk_plan(plan["queryPlanner"]["winningPlan"], stages, indexes)
+        stats = plan.get("executionStats", {})
+        return {
+            "stages": stages,
+            "indexes": indexes,
+            "collscan": "COLLSCAN" in stages,
+            "keys_examined": stats.get("totalKeysExamined"),
+            "docs_examined": stats.get("totalDocsExamined"),
+            "millis": stats.get("executionTimeMillis"),
+        }
+
+    def groups(self, field: str, query: Dict = None, stats: Iterable[str] = STAT_FIELDS) -> List[Dict]:
+        """
+        Returns the number of Monsters, and the mean of each stats field,
+        per value of field, computed by the server in one $group stage: only
+        the groups cross the wire, never the Monsters.
+
+        :param field: str, one of GROUP_FIELDS, e.g. Rarity.
+        :param query: Dict, Monster attributes to filter on first. Defaults to all Monsters.
+        :param stats: Iterable[str], STAT_FIELDS to average per group.
+        :return: List[Dict], one {field, count, *stats} dict per value, sorted by value.
+        """
+        stats = list(stats)
+        if field not in GROUP_FIELDS or not set(stats) <= set(STAT_FIELDS):
+            raise ValueError(f"Cannot group {field} on {stats}")
+        group = {"_id": f"${field}", "count": {"$sum": 1}}
+        group.update({stat: {"$avg": f"${stat}"} for stat in stats})
+        pipeline = [{"$match": query or {}}, {"$group": group}, {"$sort": {"_id": 1}}]
+        return [
+            {field: result.pop("_id"), **result}
+            for result in self.collection.aggregate(pipeline)
+        ]
+
+    def histogram(self,
+                  field: str,
+                  bins: int = 10,
+                  boundaries: List[float] = None,
+                  query: Dict = None) -> Dict:
+        """
+        Returns the number of Monsters per bin of a numeric field, counted by
+        the server in one $bucket stage. Unless boundaries are given, the
+        range of the field is split into bins equal width bins, the last one
+        including the maximum. Bins are closed on the left, open on the right.
+
+        :param field: str, one of STAT_FIELDS, e.g. Health.
+        :param bins: int, the number of equal width bins, when boundaries is not given.
+        :param boundaries: List[float], the sorted edges of the bins.
+        :param query: Dict, Monster attributes to filter on first. Defaults to all Monsters.
+        :return: Dict, with keys field, bins (a list of {min, max, count} dicts,
+            empty bins included) and other (the number of Monsters outside the bins).
+        """
+        if field not in STAT_FIELDS or bins < 1:
+            raise ValueError(f"Cannot bin {field} {bins} times")
+        if boundaries is None:
+            stats = self.summary([field], query)[field]
+            if stats is None:
+                return {"field": field, "bins": [], "other": 0}
+            low, high = stats["min"], stats["max"]
+            width = (high - low) / bins
+            boundaries = [low + width * i for i in range(bins)] + [float(np.nextafter(high, np.inf))]
+            if width == 0:
+                boundaries = boundaries[:1] + boundaries[-1:]
+        if len(boundaries) < 2 or sorted(set(boundaries)) != list(boundaries):
+            raise ValueError(f"Invalid boundaries {boundaries}")
+        pipeline = [{"$match": query or {}}, {"$bucket": {
+            "groupBy": f"${field}",
+            "boundaries": list(boundaries),
+            "default": "other",
+            "output": {"count": {"$sum": 1}},
+        }}]
+        counts = {result["_id"]: result["count"] for result in self.collection.aggregate(pipeline)}
+        return {
+            "field": field,
+            "bins": [
+                {"min": low, "max": high, "count": counts.get(low, 0)}
+                for low, high in zip(boundaries, boundaries[1:])
+            ],
+            "other": counts.get("other", 0),
+        }
+
+    def summary(self, fields: Iterable[str] = STAT_FIELDS, query: Dict = None) -> Dict:
+        """
+        Returns the number of Monsters, and the min, max, mean and population
+        standard deviation of each numeric field, computed by the server in
+        one $group stage.
+
+        :param fields: Iterable[str], STAT_FIELDS to summarize.
+        :param query: Dict, Monster attributes to filter on first. Defaults to all Monsters.
+        :return: Dict, with the count, and a {min, max, mean, std} dict per field,
+            None when no Monster matches.
+        """
+        fields = list(fields)
+        if not set(fields) <= set(STAT_FIELDS):
+            raise ValueError(f"Cannot summarize {fields}")
+        group = {"_id": None, "count": {"$sum": 1}}
+        for field in fields:
+            group.update({
+                f"{field}_min": {"$min": f"${field}"},
+                f"{field}_max": {"$max": f"${field}"},
+                f"{field}_mean": {"$avg": f"${field}"},
+                f"{field}_std": {"$stdDevPop": f"${field}"},
+            })
+        result = next(self.collection.aggregate([{"$match": query or {}}, {"$group": group}]), None)
+        count = result["count"] if result else 0
+        summary = {"count": count}
+        for field in fields:
+            summary[field] = {
+                stat: result[f"{field}_{stat}"] for stat in ("min", "max", "mean", "std")
+            } if count else None
+        return summary
+
+    def html_table(self, records: List[Dict] = None) -> str:
+        """
+        Returns a string containing a html table of one page of Monsters
         in the database's current collection.
 
+        :param records: List[Dict], the Monsters of a page. Defaults to the first page.
         :return: str, html formatted in a table.
         """
-        df = self.dataframe()
+        if records is None:
+            records = self.page()["records"]
+        df = DataFrame(records)
         html_table = df.to_html(border=1, classes='dataframe', index=True)
         return html_table
 
 
+def _count_change(change: Dict) -> Optional[int]:
+    """
+    The number of Monsters a change stream event adds or removes, None when
+    unknown (e.g. the collection was dropped).
+    """
+    operation = change.get("operationType")
+    if operation in ("update", "replace"):
+        return 0
+    return {"insert": 1, "delete": -1}.get(operation)
+
+
+def _resendable(operation) -> bool:
+    """
+    Whether applying a write model twice leaves the collection as applying
+    it once does (an InsertOne once its _id is set, see Database.bulk()).
+    """
+    if isinstance(operation, (InsertOne, ReplaceOne, DeleteOne)):
+        return True
+    return isinstance(operation, UpdateOne) and bool(operation._upsert)
+
+
+def _walk_plan(plan: Dict, stages: List[str], indexes: List[str]) -> None:
+    """
+    Collects the stages and index names of a query plan, from the root down.
+    Plans of the slot based engine nest the classic plan under queryPlan.
+
+    :param plan: Dict, a winning plan from explain().
+    :param stages: List[str], the stages found so far.
+    :param indexes: List[str], the index names found so far.
+    :return: None
+    """
+    if "queryPlan" in plan:
+        plan = plan["queryPlan"]
+    stages.append(plan.get("stage"))
+    if "indexName" in plan:
+        indexes.append(plan["indexName"])
+    for child in [plan["inputStage"]] if "inputStage" in plan else plan.get("inputStages", ()):
+        _walk_plan(child, stages, indexes)
+
+
+def _monsters(amount: int) -> List[Dict]:
+    """
+    Generates amount Monster dicts, in a seeding worker process.
+
+    :param amount: int, the number of Monsters.
+    :return: List[Dict], the Monsters.
+    """
+    return [Monster().to_dict() for _ in range(amount)]
+
+
+def _done(result) -> Future:
+    """
+    Wraps an already computed result as a completed future.
+
+    :param result: the result.
+    :return: Future, holding the result.
+    """
+    future = Future()
+    future.set_result(result)
+    return future
+
+
+def _encode_cursor(record: Dict, sort: str) -> str:
+    """
+    Packs the (sort value, _id) key of a Monster into an url-safe cursor.
+
+    :param record: Dict, a Monster including its _id.
+    :param sort: str, the field the page is sorted on.
+    :return: str, the cursor.
+    """
+    key = [None if sort == "_id" else record.get(sort), str(record["_id"])]
+    return urlsafe_b64encode(dumps(key).encode()).decode()
+
+
+def _decode_cursor(token: str) -> tuple:
+    """
+    Unpacks a cursor made by _encode_cursor().
+
+    :param token: str, the cursor.
+    :return: tuple, of the sort value and the ObjectId.
+    """
+    try:
+        value, _id = loads(urlsafe_b64decode(token.encode()))
+        return value, ObjectId(_id)
+    except (Base64Error, InvalidId, TypeError, ValueError) as error:
+        raise ValueError(f"Invalid page cursor {token!r}") from error
+
+
+def _keyset(sort: str, value, _id: ObjectId, direction: int) -> Dict:
+    """
+    Builds the filter matching the Monsters strictly past (value, _id)
+    in the given sort direction.
+
+    MongoDB sorts missing/null values before everything else, and range
+    operators never match null, so nulls are handled explicitly.
+
+    :param sort: str, the field the page is sorted on.
+    :param value: the sort value of the cursor row.
+    :param _id: ObjectId, the _id of the cursor row.
+    :param direction: int, ASCENDING or DESCENDING.
+    :return: Dict, a MongoDB filter.
+    """
+    op = "$gt" if direction == ASCENDING else "$lt"
+    if sort == "_id":
+        return {"_id": {op: _id}}
+    branches: List[Dict] = [{sort: value, "_id": {op: _id}}]
+    if value is None:
+        if direction == ASCENDING:
+            branches.append({sort: {"$ne": None}})
+    else:
+        branches.append({sort: {op: value}})
+        if direction == DESCENDING:
+            branches.append({sort: None})
+    return {"$or": branches}
+
+
 if __name__ == '__main__':
     '''
     This code is run when data.py file is the main program.
@@ -0,0 +1,100 @@
+from typing import Sequence, Tuple
+
+import numpy as np
+
+
+class FlatForest:
+    """
+    A trained tree ensemble classifier (e.g. RandomForestClassifier) flattened
+    into plain NumPy node arrays, for fast single-row predictions.
+
+    All the trees' nodes are concatenated into one set of arrays. Leaves point
+    to themselves, so every tree is walked in lockstep: each step moves all
+    the trees one level down with a handful of vectorized array lookups, and
+    after max_depth steps every tree sits on its leaf. No DataFrame is built
+    and no input validation is run, so a prediction costs microseconds.
+
+    Matches the estimator's predict_proba(): features are compared as float32,
+    like scikit-learn does, and the leaf class distributions are averaged over
+    the trees. Rows must not contain NaN.
+
+    Instance Attributes:
+    ---------
+    self.children : np.ndarray
+        Shape (2, n_nodes), the left and right child of every node.
+    self.feature : np.ndarray
+        The feature each node splits on.
+    self.threshold : np.ndarray
+        The split threshold of each node, +inf on leaves.
+    self.proba : np.ndarray
+        Shape (n_nodes, n_classes), the class distribution of each node divided by the number of trees.
+    self.roots : np.ndarray
+        The root node of each tree.
+    self.depth : int
+        The depth of the deepest tree.
+    self.classes : np.ndarray
+        The class of each column of proba.
+    """
+
+    def __init__(self, children, feature, threshold, proba, roots, depth, classes) -> None:
+        self.children = children
+        self.feature = feature
+        self.threshold = threshold
+        self.proba = proba
+        self.roots = roots
+        self.depth = depth
+        self.classes = classes
+
+    @classmethod
+    def from_estimator(cls, model) -> 'FlatForest':
+        """
+        Flattens a fitted single-output forest classifier.
+
+        :param model: a fitted forest classifier with estimators_ and classes_.
+        :return: FlatForest, the flattened forest.
+        """
+        trees = [estimator.tree_ for estimator in model.estimators_]
+        offsets = np.cumsum([0] + [tree.node_count for tree in trees])
+        left, right, feature, threshold, proba = [], [], [], [], []
+        for offset, tree in zip(offsets, trees):
+            nodes = np.arange(tree.node_count)
+            leaf = tree.children_left == -1
+            left.append(np.where(leaf, nodes, tree.children_left) + offset)
+            right.append(np.where(leaf, nodes, tree.children_right) + offset)
+            feature.append(np.where(leaf, 0, tree.feature))
+            threshold.append(np.where(leaf, np.inf, tree.threshold))
+            value = tree.value[:, 0, :]
+            proba.append(value / value.sum(axis=1, keepdims=True))
+        return cls(
+            children=np.stack([np.concatenate(left), np.concatenate(right)]).astype(np.intp),
+            feature=np.concatenate(feature).astype(np.intp),
+            threshold=np.concatenate(threshold),
+            proba=np.concatenate(proba) / len(trees),
+            roots=offsets[:-1].astype(np.intp),
+            depth=max(tree.max_depth for tree in trees),
+            classes=np.asarray(model.classes_),
+        )
+
+    def predict_proba(self, row: Sequence[float]) -> np.ndarray:
+        """
+        Returns the class probabilities of one row.
+
+        :param row: Sequence[float], the feature values in training order.
+        :return: np.ndarray, the probability of each class in self.classes.
+        """
+        x = np.asarray(row, dtype=np.float32)
+        nodes = self.roots
+        for _ in range(self.depth):
+            nodes = self.children[(x[self.feature[nodes]] > self.threshold[nodes]).view(np.int8), nodes]
+        return self.proba[nodes].sum(axis=0)
+
+    def __call__(self, row: Sequence[float]) -> Tuple:
+        """
+        Predicts one row.
+
+        :param row: Sequence[float], the feature values in training order.
+        :return: Tuple, of the predicted class and its probability.
+        """
+        probabilities = self.predict_proba(row)
+        best = probabilities.argmax()
+        return self.classes[best], probabilities[best]
@@ -1,6 +1,21 @@
+from gzip import compress
+from os import getenv
+from typing import Dict
+
 from altair import Chart, Tooltip
-from pandas import DataFrame
+from pandas import DataFrame, Series, qcut
+from pandas.api.types import is_numeric_dtype
 import altair as alt
+import numpy as np
+
+# Above CHART_ROWS rows, charts are drawn from a reduced copy of the data (CHART_MODE):
+#  sample - a sample of CHART_ROWS rows, stratified by the target so every class keeps its share
+#  bin    - one circle per cell of a CHART_BINS x CHART_BINS grid, sized by its count and
+#           colored by its most common (or mean numeric) target
+#  points - every row, whatever the size (inline data is limited by Altair to 5000 rows)
+CHART_MODE = getenv("VIEW_CHART_MODE", "sample")
+CHART_ROWS = int(getenv("VIEW_CHART_ROWS", "5000"))
+CHART_BINS = int(getenv("VIEW_CHART_BINS", "40"))
 
 # Define a custom theme
 def custom_theme():
@@ -29,15 +44,40 @@ alt.themes.register('custom', custom_theme)
 alt.themes.enable('custom')
 
 
-def chart(df: DataFrame, x: str, y: str, target: str) -> Chart:
+def chart(df: DataFrame, x: str, y: str, target: str,
+          mode: str = None, threshold: int = None, bins: int = None, url: str = None) -> Chart:
+    """
+    Scatter plot of y by x colored by target. Above threshold rows the data is
+    reduced on the server first (see chart_data()), which keeps the spec the
+    same size however big df gets.
+
+    The rows are embedded in the spec, unless url is given: then the spec
+    loads them from url as CSV, e.g. from the /view/data endpoint with the
+    chart_query() parameters, and carries only the encoding.
+    """
+    mode = mode or CHART_MODE
+    threshold = CHART_ROWS if threshold is None else threshold
+    bins = bins or CHART_BINS
+    data = chart_data(df, x, y, target, mode, threshold, bins)
+    types = {column: "quantitative" if is_numeric_dtype(data[column]) else "nominal" for column in data.columns}
+    if url is not None:
+        parse = {column: "number" if kind == "quantitative" else "string" for column, kind in types.items()}
+        source = alt.UrlData(url=url, format=alt.CsvDataFormat(type="csv", parse=parse))
+    else:
+        source = data
+    encoding = dict(
+        x=alt.X(x, type=types[x]),
+        y=alt.Y(y, type=types[y]),
+        color=alt.Color(target, type=types[target]),
+        tooltip=[Tooltip(column, type=kind) for column, kind in types.items()],
+    )
+    if "Count" in data.columns and "Count" not in df.columns:
+        encoding.update(size=alt.Size("Count", type="quantitative", legend=None))
     graph = Chart(
-        df,
+        source,
         title=f"{y} by {x} for {target}",
     ).mark_circle(size=100).encode(
-        x=x,
-        y=y,
-        color=target,
-        tooltip=Tooltip(df.columns.to_list())
+        **encoding
     ).properties(
         width=600,
         height=600,
@@ -46,3 +86,154 @@ def chart(df: DataFrame, x: str, y: str, target: str) -> Chart:
     )
     return graph
 
+
+def chart_query(rows: int, x: str, y: str, target: str,
+                mode: str = None, threshold: int = None) -> Dict[str, str]:
+    """
+    Returns the chart options the data of a chart depends on: none when it is
+    drawn as it is, the target for a stratified sample, all of them when
+    binned. Charts with the same query share their data, so a client loading
+    it from an URL with these parameters fetches it once for all of them.
+
+    :param rows: int, the number of rows of the chart's dataframe.
+    :param x: str, the x axis column.
+    :param y: str, the y axis column.
+    :param target: str, the color column.
+    :param mode: str, sample, bin or points. Defaults to CHART_MODE.
+    :param threshold: int, the number of rows drawn as they are. Defaults to CHART_ROWS.
+    :return: Dict[str, str], the query parameters.
+    """
+    mode = mode or CHART_MODE
+    threshold = CHART_ROWS if threshold is None else threshold
+    if mode == "points" or rows <= threshold:
+        return {}
+    if mode == "sample":
+        return {"target": target}
+    return {"x": x, "y": y, "target": target}
+
+
+def chart_csv(df: DataFrame, x: str, y: str, target: str,
+              mode: str = None, threshold: int = None, bins: int = None) -> bytes:
+    """
+    Returns the chart data of df as gzip compressed CSV, for a chart spec
+    loading it from an URL (see chart()). The output is deterministic, so
+    its hash can serve as an HTTP ETag.
+
+    :param df: DataFrame, the Monsters, with only the columns to show.
+    :param x: str, the x axis column.
+    :param y: str, the y axis column.
+    :param target: str, the color column.
+    :param mode: str, sample, bin or points. Defaults to CHART_MODE.
+    :param threshold: int, the number of rows drawn as they are. Defaults to CHART_ROWS.
+    :param bins: int, the number of bins per numeric axis in bin mode. Defaults to CHART_BINS.
+    :return: bytes, the compressed CSV.
+    """
+    threshold = CHART_ROWS if threshold is None else threshold
+    data = chart_data(df, x, y, target, mode or CHART_MODE, threshold, bins or CHART_BINS)
+    return compress(data.to_csv(index=False).encode(), compresslevel=6, mtime=0)
+
+
+def chart_data(df: DataFrame, x: str, y: str, target: str,
+               mode: str = "sample", threshold: int = CHART_ROWS, bins: int = CHART_BINS) -> DataFrame:
+    """
+    Returns the rows to draw for a chart of df: df itself up to threshold rows
+    or in points mode, otherwise a stratified sample of threshold rows (sample
+    mode) or the counts of a bins x bins grid over x and y (bin mode).
+
+    :param df: DataFrame, the Monsters.
+    :param x: str, the x axis column.
+    :param y: str, the y axis column.
+    :param target: str, the color column.
+    :param mode: str, sample, bin or points.
+    :param threshold: int, the number of rows drawn as they are.
+    :param bins: int, the number of bins per numeric axis in bin mode.
+    :return: DataFrame, the rows to draw.
+    """
+    if mode == "points" or len(df) <= threshold:
+        return df
+    if mode == "sample":
+        return downsample(df, target, threshold)
+    if mode == "bin":
+        return binned(df, x, y, target, bins)
+    raise ValueError(f"Unknown chart mode {mode!r}")
+
+
+def downsample(df: DataFrame, target: str, rows: int, random_state: int = 42) -> DataFrame:
+    """
+    Returns rows rows of df, sampled within each target class in proportion
+    to its size, with at least one row of every class (so more than rows when
+    there are more classes). A numeric target with many values is stratified
+    by its deciles.
+
+    :param df: DataFrame, the rows to sample.
+    :param target: str, the column to stratify on.
+    :param rows: int, the number of rows to keep.
+    :param random_state: int, seeds the sample.
+    :return: DataFrame, the sample.
+    """
+    strata = _strata(df[target])
+    shuffled = np.random.default_rng(random_state).permutation(len(df))
+    strata = strata.iloc[shuffled]
+    # Keep the first rows of each stratum, in a random order, up to its quota
+    quotas = _quotas(strata.value_counts(), rows)
+    quota = strata.map(quotas).to_numpy(dtype=float)
+    rank = strata.groupby(strata, observed=True, sort=False).cumcount().to_numpy()
+    return df.iloc[np.sort(shuffled[rank < quota])]
+
+
+def binned(df: DataFrame, x: str, y: str, target: str, bins: int) -> DataFrame:
+    """
+    Aggregates df on a bins x bins grid over x and y: one row per non-empty
+    cell, at the cell center, with the number of rows in it (Count) and their
+    most common target (or mean target, when numeric). Non numeric axes and
+    numeric axes with at most bins values are not binned.
+
+    :param df: DataFrame, the rows to aggregate.
+    :param x: str, the x axis column.
+    :param y: str, the y axis column.
+    :param target: str, the color column.
+    :param bins: int, the number of bins per axis.
+    :return: DataFrame, with the columns x, y, target and Count.
+    """
+    cells = DataFrame({target: df[target], x: _bin(df[x], bins), y: _bin(df[y], bins)})
+    axes = list(dict.fromkeys([x, y]))
+    counts = cells.groupby(axes, observed=True).size().rename("Count")
+    if target in axes:
+        return counts.reset_index()
+    if is_numeric_dtype(cells[target]):
+        color = cells.groupby(axes, observed=True)[target].mean()
+    else:
+        by_class = cells.groupby(axes + [target], observed=True).size().rename("Rows").reset_index()
+        color = by_class.sort_values("Rows", ascending=False).drop_duplicates(axes).set_index(axes)[target]
+    return counts.to_frame().join(color).reset_index()
+
+
+def _bin(values: Series, bins: int) -> Series:
+    # Replace numeric values by the center of their bin, out of bins equal width bins
+    if not is_numeric_dtype(values) or values.nunique() <= bins:
+        return values
+    data = values.to_numpy(dtype=float)
+    edges = np.linspace(np.nanmin(data), np.nanmax(data), bins + 1)
+    index = np.clip(np.searchsorted(edges, data, side="right") - 1, 0, bins - 1)
+    return Series((edges[:-1] + edges[1:])[index] / 2, index=values.index, name=values.name)
+
+
+def _quotas(sizes: Series, rows: int) -> Series:
+    # Split rows between the strata in proportion to their sizes (largest remainders), at least one each
+    sizes = sizes[sizes > 0]
+    shares = sizes * rows / sizes.sum()
+    quotas = np.floor(shares).clip(lower=1)
+    left = rows - int(quotas.sum())
+    if left > 0:
+        quotas[(shares - quotas).nlargest(left).index] += 1
+    while left < 0 and quotas.max() > 1:
+        quotas[quotas.idxmax()] -= 1
+        left += 1
+    return quotas
+
+
+def _strata(values: Series) -> Series:
+    # Classes to stratify on: the values themselves, or the deciles of a numeric column with many values
+    if is_numeric_dtype(values) and values.nunique() > 50:
+        return qcut(values, 10, duplicates="drop")
+    return values
@@ -0,0 +1,177 @@
+import json
+import os
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from logging import exception
+from threading import Lock
+from typing import Callable, Dict, Optional
+from uuid import uuid4
+
+try:
+    import fcntl
+except ImportError:  # no file locks (Windows), jobs are only shared within a process
+    fcntl = None
+
+
+class TrainingJobs:
+    """
+    Background executor for model retraining.
+
+    Jobs run on a single worker thread, so at most one retrain runs at a time.
+    Submitting while a job is queued or running returns that job instead of
+    starting another one. The request thread only submits and returns; the
+    job is expected to publish its model itself once it is ready.
+
+    Given a directory (e.g. next to the model file), the jobs are shared by
+    every process on the host, e.g. all the gunicorn workers: an exclusive
+    lock on its active.lock file, held from submit until the job finishes,
+    lets one job run at a time across processes (the OS drops the lock of a
+    process that dies), and every job is written to <id>.json, so any
+    process can report its status.
+
+    Jobs are dicts with keys id, status (queued, running, done or failed),
+    submitted, started, finished (ISO timestamps) and error.
+
+    Instance Attributes:
+    ---------
+    self.directory : str
+        Where the jobs are shared, or None to keep them in this process.
+    self.history : int
+        The number of finished jobs kept for status polling.
+    """
+
+    def __init__(self, directory: Optional[str] = None, history: int = 100) -> None:
+        self.directory = directory if fcntl is not None else None
+        self.history = history
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='retrain')
+        self._jobs = OrderedDict()
+        self._active = None
+        self._lock = Lock()
+        if self.directory is not None:
+            os.makedirs(self.directory, exist_ok=True)
+
+    def submit(self, train: Callable[[], object]) -> str:
+        """
+        Queues train to run in the background, unless a job is already active
+        (in any process sharing the directory).
+
+        :param train: Callable, trains and publishes a model.
+        :return: str, the id of the new or the already active job.
+        """
+        with self._lock:
+            if self._active is not None:
+                return self._active
+            job = {
+                'id': uuid4().hex,
+                'status': 'queued',
+                'submitted': _now(),
+                'started': None,
+                'finished': None,
+                'error': None,
+            }
+            lock = None
+            if self.directory is not None:
+                lock = open(os.path.join(self.directory, 'active.lock'), 'a+')
+                active = _holder(lock)
+                if active is not None:
+                    # Another process runs a job, join it
+                    return active
+                lock.truncate(0)
+                lock.write(job['id'])
+                lock.flush()
+            self._jobs[job['id']] = job
+            self._active = job['id']
+            while len(self._jobs) > self.history:
+                old, _ = self._jobs.popitem(last=False)
+                self._forget(old)
+            self._save(job)
+        self._executor.submit(self._run, job, train, lock)
+        return job['id']
+
+    def status(self, job_id: str) -> Optional[Dict]:
+        """
+        Returns a copy of the job, or None for an unknown id.
+
+        :param job_id: str, the id returned by submit().
+        :return: Dict, the job.
+        """
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is not None:
+                return dict(job)
+        if self.directory is None or not job_id.isalnum():
+            return None
+        try:
+            with open(os.path.join(self.directory, f'{job_id}.json')) as file:
+                return json.load(file)
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def active(self) -> Optional[str]:
+        """
+        Returns the id of the queued or running job, if any.
+
+        :return: str, the job id, or None.
+        """
+        if self._active is not None or self.directory is None:
+            return self._active
+        with self._lock, open(os.path.join(self.directory, 'active.lock'), 'a+') as lock:
+            active = _holder(lock)
+            if active is None:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+            return active
+
+    def _run(self, job: Dict, train: Callable[[], object], lock) -> None:
+        job.update(status='running', started=_now())
+        self._save(job)
+        try:
+            train()
+        except Exception as error:
+            exception('Retraining job %s failed', job['id'])
+            job.update(status='failed', error=str(error))
+        else:
+            job.update(status='done')
+        finally:
+            job['finished'] = _now()
+            self._save(job)
+            with self._lock:
+                self._active = None
+                if lock is not None:
+                    lock.close()  # releases the lock
+
+    def _save(self, job: Dict) -> None:
+        # Write the job atomically, so a process polling it never reads half of it
+        if self.directory is None:
+            return
+        path = os.path.join(self.directory, f"{job['id']}.json")
+        with open(f'{path}.tmp', 'w') as file:
+            json.dump(job, file)
+        os.replace(f'{path}.tmp', path)
+
+    def _forget(self, job_id: str) -> None:
+        if self.directory is None:
+            return
+        try:
+            os.remove(os.path.join(self.directory, f'{job_id}.json'))
+        except FileNotFoundError:
+            pass
+
+
+def _holder(lock) -> Optional[str]:
+    """
+    Takes the exclusive lock on the open lock file, or when another process
+    holds it, returns the id of that process' job (written in the file).
+    """
+    try:
+        fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        lock.seek(0)
+        active = lock.read().strip()
+        lock.close()
+        return active
+    return None
+
+
+def _now() -> str:
+    return datetime.now().isoformat(timespec='seconds')
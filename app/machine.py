@@ -1,105 +1,460 @@
-from pandas import DataFrame
-from sklearn.ensemble import RandomForestClassifier
+import numpy as np
+from pandas import Categorical, DataFrame, concat
+from sklearn.ensemble import ExtraTreesClassifier, HistGradientBoostingClassifier, RandomForestClassifier
 from sklearn.model_selection import train_test_split
 from sklearn.metrics import accuracy_score
 from sklearn.preprocessing import LabelEncoder
-from joblib import load, dump
+from joblib import load, dump, parallel_backend
+from dataclasses import asdict, dataclass, field, replace
 from datetime import datetime
+from tempfile import mkstemp
+from typing import Iterable, Optional, Sequence
+from logging import warning
 import os
 
+from app.forest import FlatForest
+
 # Define the project root path
 PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
 
+# Define the model artifact path
+MODEL_PATH = os.path.join(PROJECT_ROOT, 'app', 'model.joblib')
+
+# Define the feature schema and target of the model
+FEATURES = ['Level', 'Health', 'Energy', 'Sanity']
+TARGET = 'Rarity'
+RANKS = ['Rank 0', 'Rank 1', 'Rank 2', 'Rank 3', 'Rank 4', 'Rank 5']
+
+# Define the estimator families a TrainingConfig can build
+FAMILIES = {
+    'random_forest': RandomForestClassifier,
+    'extra_trees': ExtraTreesClassifier,
+    'gradient_boosting': HistGradientBoostingClassifier,
+}
+
+# Define the version of the model file layout written by Machine.save()
+ARTIFACT_FORMAT = 2
+
+
+def _env(name, cast, default):
+    value = os.getenv(name)
+    return cast(value) if value not in (None, '') else default
+
+
+def _compress(value: str):
+    # Parse a joblib compress setting: a level ('3'), a method ('lz4') or both ('zlib:3')
+    method, _, level = value.partition(':')
+    if method.isdigit():
+        return int(method)
+    return (method, int(level)) if level else method
+
+
+def _flatten(model) -> Optional[FlatForest]:
+    # Flatten tree ensembles for single-row predictions, other estimators have no flat form
+    trees = getattr(model, 'estimators_', None)
+    if trees is None or not all(hasattr(tree, 'tree_') for tree in trees) or model.n_outputs_ != 1:
+        return None
+    return FlatForest.from_estimator(model)
+
+
+def reservoir(chunks: Iterable[DataFrame], size: int, random_state: int = None) -> DataFrame:
+    """
+    Returns a uniform random sample of size rows (all of them, if fewer) from a stream of
+    dataframe chunks, holding no more than the sample and one chunk in memory at any time.
+    This is reservoir sampling (Algorithm R), vectorized per chunk: row i of the stream
+    replaces a random slot j in [0, i] when j < size, later rows winning ties.
+    """
+    rng = np.random.default_rng(random_state)
+    sample = None
+    seen = 0
+    for chunk in chunks:
+        chunk = chunk.reset_index(drop=True)
+        # Fill the reservoir with the first rows
+        fill = min(len(chunk), size - seen) if seen < size else 0
+        if fill:
+            sample = chunk.iloc[:fill] if sample is None else concat([sample, chunk.iloc[:fill]], ignore_index=True)
+
+        # Then each next row replaces a random slot with probability size / (its position + 1)
+        rows = np.arange(fill, len(chunk))
+        slots = rng.integers(0, seen + rows + 1)
+        keep = slots < size
+        rows, slots = rows[keep][::-1], slots[keep][::-1]
+        slots, last = np.unique(slots, return_index=True)
+        if len(slots):
+            order = np.arange(len(sample))
+            order[slots] = len(sample) + np.arange(len(slots))
+            sample = concat([sample, chunk.iloc[rows[last]]], ignore_index=True).take(order).reset_index(drop=True)
+        seen += len(chunk)
+    return sample if sample is not None else DataFrame()
+
+
+def _uncompressed(filepath) -> bool:
+    # Uncompressed joblib files start with the pickle protocol opcode, and only they can be memory mapped
+    with open(filepath, 'rb') as file:
+        return file.read(1) == b'\x80'
+
+
+def _file_mode(filepath) -> int:
+    # The permissions of the existing file, or rw-r--r-- for a new one. The process umask is not read,
+    # that takes setting it, for every thread of the process.
+    try:
+        return os.stat(filepath).st_mode & 0o777
+    except FileNotFoundError:
+        return 0o644
+
+
+@dataclass
+class TrainingConfig:
+    """
+    The estimator family, training budget and parallelism of a Machine's model,
+    by default a Random Forest.
+
+    n_estimators and max_samples only apply to the forests (random_forest and
+    extra_trees); params are any other constructor arguments of the family,
+    e.g. learning_rate for gradient_boosting.
+
+    n_jobs and backend only apply while fitting, through a joblib backend
+    context: the saved estimator keeps n_jobs=None, so single-row predictions
+    do not pay for a thread pool. Tree building releases the GIL, so the
+    threading backend scales with the cores without copying the data.
+    """
+    n_estimators: int = 100
+    max_depth: Optional[int] = None
+    max_samples: Optional[float] = None
+    n_jobs: int = -1
+    backend: str = 'threading'
+    random_state: int = 42
+    family: str = 'random_forest'
+    params: dict = field(default_factory=dict)
+
+    @classmethod
+    def from_env(cls) -> 'TrainingConfig':
+        # Read the config from MODEL_* environment variables, defaulting to the fields above
+        return cls(
+            n_estimators=_env('MODEL_N_ESTIMATORS', int, cls.n_estimators),
+            max_depth=_env('MODEL_MAX_DEPTH', int, cls.max_depth),
+            max_samples=_env('MODEL_MAX_SAMPLES', float, cls.max_samples),
+            n_jobs=_env('MODEL_N_JOBS', int, cls.n_jobs),
+            backend=_env('MODEL_BACKEND', str, cls.backend),
+            random_state=_env('MODEL_RANDOM_STATE', int, cls.random_state),
+            family=_env('MODEL_FAMILY', str, cls.family),
+        )
+
+    def estimator(self):
+        # Build an unfitted estimator of the family with this budget
+        params = {'max_depth': self.max_depth, 'random_state': self.random_state}
+        if self.family != 'gradient_boosting':
+            params.update(n_estimators=self.n_estimators, max_samples=self.max_samples)
+        if self.family == 'extra_trees' and self.max_samples is not None:
+            params.update(bootstrap=True)
+        params.update(self.params)
+        return FAMILIES[self.family](**params)
+
+
 class Machine:
-    def __init__(self, df):
+    def __init__(self,
+                 df: DataFrame = None,
+                 filepath: str = MODEL_PATH,
+                 retrain: bool = False,
+                 config: TrainingConfig = None,
+                 data_version: str = None,
+                 watermark: str = None,
+                 selection: dict = None):
         # Create a Machine instance.
-        #  (In __init__(), Try to load an existing model. If no model exists, train one).
-        #  Use __init__() with open(). OR train a model and save it with save(). Fill in machine attributes using
-        #  the model (loaded or created) and info(): self.name, self.timestamp, self.target, self.features, self.model
+        #  (In __init__(), Try to load an existing model. If no model exists, or retrain is set, train one).
+        #  Loading needs only the model file: it carries the feature schema, labels and training metadata.
+        #  Training data (df) is only needed, and only kept as self.target/self.features, when training.
+        self.target = None
+        self.features = None
 
         # Try to load an existing model. Use open()
-        filepath = os.path.join(PROJECT_ROOT, 'app', 'model.joblib')
-        if os.path.exists(filepath):
-            model = self.open(filepath)
-            self.name = model
-            self.timestamp = datetime.now()
-            self.target = df["Rarity"]
-            self.features = df.drop(columns=["Rarity"])
-            self.model = model
-
-            # Save the model labels/classes as part of the Machine object, for future use
-            self.labels = ['Rank 0', 'Rank 1', 'Rank 2', 'Rank 3', 'Rank 4', 'Rank 5']
+        if os.path.exists(filepath) and not retrain:
+            self.load(filepath)
 
-        else:
+        elif df is not None:
             # If no model exists, train one, then save with save().
+            self.train(df, config, data_version, watermark, selection)
+            self.save(filepath)
 
-            columns_to_drop = ['Timestamp', 'Damage', 'Name', 'Type']
-            columns_to_drop = [col for col in columns_to_drop if col in df.columns]
-            if columns_to_drop:
-                df.drop(columns=columns_to_drop, inplace=True)
+        else:
+            raise FileNotFoundError(f'No model at {filepath} and no data to train one')
 
-            self.target = df["Rarity"]
-            self.features = df.drop(columns=["Rarity"])
+    def __call__(self, pred_basis: DataFrame):
+        # Predict the first row of pred_basis
+        predictions, confidences = self.predict_batch(pred_basis)
+        return predictions[0], confidences[0]
 
-            # Initializing the Random Forest Classifier
-            self.model = RandomForestClassifier(random_state=42)
+    def predict_one(self, row: Sequence[float]):
+        # Predict a single row, a plain tuple in feature order like (level, health, energy, sanity).
+        # Forests go through their flattened NumPy form (self.forest), without building a DataFrame
+        # or running scikit-learn's input validation. Returns the class code and the confidence.
+        if self.forest is None:
+            return self(DataFrame([row], columns=self.feature_names))
+        return self.forest(row)
 
-            # Fitting the model
-            self.model.fit(self.features, self.target)
+    def predict_batch(self, pred_basis: DataFrame):
+        """
+        Predicts every row of pred_basis with a single predict_proba pass over the forest:
+        the prediction of a row is its most probable class, and the confidence that probability.
+        Returns two arrays, the predicted class codes (see self.labels) and the confidences.
+        """
+        if isinstance(pred_basis, DataFrame):
+            pred_basis = pred_basis[self.feature_names]
+        probabilities = self.model.predict_proba(pred_basis)
+        best = probabilities.argmax(axis=1)
+        return self.model.classes_[best], probabilities[np.arange(len(best)), best]
 
-            # Save the trained model
-            self.save(filepath)
+    def train(self,
+              df: DataFrame,
+              config: TrainingConfig = None,
+              data_version: str = None,
+              watermark: str = None,
+              selection: dict = None):
+        """
+        Fits a new model on df with config, by default TrainingConfig.from_env().
+        The target labels are encoded as integers, and their names kept in self.labels.
+        data_version records which state of the collection df was read at, and watermark
+        the newest Monster _id it holds (see Database.watermark()), where grow() resumes from.
+        selection is the model selection summary of config, when it was promoted by app.selection.
+        """
+        encoder = LabelEncoder()
+        self.config = config or TrainingConfig.from_env()
+        self.target = df[TARGET]
+        self.features = df[FEATURES]
 
-            self.name = self.model
-            self.timestamp = datetime.now()
-            self.target = df["Rarity"]
-            self.features = df.drop(columns=["Rarity"])
+        # Initializing the Random Forest Classifier
+        self.model = self.config.estimator()
 
-            # Save the labels/classes for future use
-            self.labels = ['Rank 0', 'Rank 1', 'Rank 2', 'Rank 3', 'Rank 4', 'Rank 5']
+        # Fitting the model, on as many cores as the config allows
+        with parallel_backend(self.config.backend, n_jobs=self.config.n_jobs):
+            self.model.fit(self.features, encoder.fit_transform(self.target))
 
-    def __call__(self, pred_basis: DataFrame):
-        prediction, *_ = self.model.predict(pred_basis)
-        confidence = max(self.model.predict_proba(pred_basis)[0])
-        return prediction, confidence
+        self.name = self.model
+        self.timestamp = datetime.now()
+        self.feature_names = list(FEATURES)
+        self.labels = [str(label) for label in encoder.classes_]
+        self.rows = len(df)
+        self.data_version = data_version
+        self.watermark = watermark
+        self.selection = selection
+        self.forest = _flatten(self.model)
 
-    def retrain(self, df):
-        filepath = os.path.join(PROJECT_ROOT, 'app', 'model.joblib')
+    def grow(self, df: DataFrame, trees: int = None, data_version: str = None, watermark: str = None) -> bool:
+        """
+        Grows the forest with trees new trees fitted on df alone, e.g. the Monsters inserted
+        since self.watermark, keeping the existing trees (scikit-learn's warm_start).
+        The cost depends on len(df), not on all the rows seen so far.
 
-        columns_to_drop = ['Timestamp', 'Damage', 'Name', 'Type']
-        columns_to_drop = [col for col in columns_to_drop if col in df.columns]
-        if columns_to_drop:
-            df.drop(columns=columns_to_drop, inplace=True)
+        By default the new trees get the share of the forest that df has of all the rows,
+        so each row keeps about the same weight. The forest only grows, a full retrain()
+        brings it back to config.n_estimators trees.
 
-        self.target = df["Rarity"]
-        self.features = df.drop(columns=["Rarity"])
+        Returns False, leaving the machine unchanged, when df cannot be learned incrementally:
+        the model must be a forest, and df must hold every known label and no new one, as the
+        classes of all trees must match.
+        """
+        if self.forest is None:
+            return False
+        codes = Categorical(df[TARGET], categories=self.labels).codes
+        known = np.array_equal(self.model.classes_, np.arange(len(self.labels)))
+        if not known or not self.rows or (codes < 0).any() or len(np.unique(codes)) != len(self.labels):
+            return False
+        if trees is None:
+            trees = max(1, round(len(self.model.estimators_) * len(df) / self.rows))
 
-        # Initializing the Random Forest Classifier
-        self.model = RandomForestClassifier(random_state=42)
+        # Fitting only the new trees, the existing ones are kept as they are
+        config = self.config or TrainingConfig.from_env()
+        self.model.set_params(warm_start=True, n_estimators=len(self.model.estimators_) + trees)
+        try:
+            with parallel_backend(config.backend, n_jobs=config.n_jobs):
+                self.model.fit(df[self.feature_names], codes)
+        finally:
+            self.model.set_params(warm_start=False)
+
+        self.timestamp = datetime.now()
+        self.rows += len(df)
+        self.data_version = data_version
+        self.watermark = watermark
+        self.forest = _flatten(self.model)
+        return True
+
+    @classmethod
+    def stream(cls,
+               chunks: Iterable[DataFrame],
+               filepath: str = MODEL_PATH,
+               trees: int = None,
+               config: TrainingConfig = None,
+               data_version: str = None,
+               watermark: str = None,
+               labels: Iterable[str] = None,
+               carry: int = 100_000,
+               selection: dict = None) -> 'Machine':
+        """
+        Trains a new Machine one chunk of rows at a time and saves it, so only one chunk is
+        ever held in memory (e.g. chunks from Database.chunks()). The first chunk fits a forest
+        of trees trees (by default config.n_estimators), and every next one grows it by trees
+        trees fitted on that chunk alone (see grow()).
+
+        The labels are all the values of the target, e.g. from a distinct() query, by default
+        those of the first chunk. Rows with another label are skipped, and a chunk missing a
+        label is carried over into the next one, so a rare label is never dropped for the rest
+        of the stream. At most carry rows are carried over: beyond that, the oldest rows of each
+        label are left out, keeping the same number of the newest rows of every label. Should
+        the first fit still miss a label after the last chunk, the model is fitted without it,
+        and any rows still carried over are not learned.
+        The file is written once, after the last chunk.
+        """
+        config = config or TrainingConfig.from_env()
+        trees = trees or config.n_estimators
+        labels = sorted(str(label) for label in labels) if labels is not None else None
+        machine = cls.__new__(cls)
+        machine.target = None
+        machine.features = None
+        machine.model = None
 
-        # Fitting the model
-        self.model.fit(self.features, self.target)
+        def fit(chunk):
+            machine.train(chunk, replace(config, n_estimators=trees), data_version, watermark, selection)
+            machine.config = config
+            machine.target = machine.features = None
+            if machine.forest is None:
+                raise ValueError(f'A {config.family} model cannot be trained in chunks')
 
-        # Save the trained model
+        pending, dropped = None, 0
+        for chunk in chunks:
+            if pending is not None:
+                chunk = concat([pending, chunk], ignore_index=True)
+                pending = None
+            if machine.model is None:
+                if labels is not None:
+                    chunk = chunk[chunk[TARGET].isin(labels)]
+                if labels is not None and chunk[TARGET].nunique() < len(labels):
+                    pending = chunk
+                else:
+                    fit(chunk)
+            else:
+                chunk = chunk[chunk[TARGET].isin(machine.labels)]
+                if not machine.grow(chunk, trees, data_version, watermark):
+                    pending = chunk
+            if pending is not None and len(pending) > carry:
+                # Keep the newest rows of every label, so no label present drops out
+                per_label = max(1, carry // pending[TARGET].nunique())
+                kept = pending.groupby(TARGET, observed=True, group_keys=False).tail(per_label)
+                dropped += len(pending) - len(kept)
+                pending = kept
+        if machine.model is None and pending is not None and len(pending):
+            missing = sorted(set(labels) - set(pending[TARGET].astype(str)))
+            warning(f'Labels {missing} were missing from every chunk, and left out of the model')
+            fit(pending)
+            pending = None
+        if machine.model is None:
+            raise ValueError('No rows to train a model on')
+        if pending is not None:
+            dropped += len(pending)
+        if dropped:
+            warning(f'{dropped} rows missing a label were left out of the model')
+        machine.save(filepath)
+        return machine
+
+    def retrain(self, df: DataFrame, filepath: str = MODEL_PATH, config: TrainingConfig = None):
+        # Train a new model on df and save it
+        self.train(df, config)
         self.save(filepath)
 
+    def load(self, filepath: str = MODEL_PATH, mmap_mode: Optional[str] = 'r'):
+        # Fill in the machine attributes from the model file alone
+        artifact = self.artifact(filepath, mmap_mode)
+        meta = artifact['meta']
+        self.model = artifact['model']
         self.name = self.model
-        self.timestamp = datetime.now()
-        self.target = df["Rarity"]
-        self.features = df.drop(columns=["Rarity"])
+        self.timestamp = meta['timestamp']
+        self.feature_names = meta['features']
+        self.labels = meta['labels']
+        self.rows = meta['rows']
+        self.config = TrainingConfig(**meta['config']) if meta.get('config') else None
+        self.data_version = meta.get('data_version')
+        self.watermark = meta.get('watermark')
+        self.selection = meta.get('selection')
+        self.forest = _flatten(self.model)
+
+    def meta(self) -> dict:
+        # The metadata header stored with the model: feature schema, labels and training metadata
+        return {
+            'features': self.feature_names,
+            'labels': self.labels,
+            'timestamp': self.timestamp,
+            'rows': self.rows,
+            'config': asdict(self.config) if self.config else None,
+            'data_version': self.data_version,
+            'watermark': self.watermark,
+            'selection': self.selection,
+        }
 
-        # Save the labels/classes for future use
-        self.labels = ['Rank 0', 'Rank 1', 'Rank 2', 'Rank 3', 'Rank 4', 'Rank 5']
+    def save(self, filepath, compress=None):
+        # Save the model to a file, after a metadata header, in the ARTIFACT_FORMAT layout.
+        # compress is a joblib compress setting, by default MODEL_COMPRESS, else 0: uncompressed files are
+        # bigger but load fastest, and their arrays can be memory mapped.
+        # It is written to a temporary file next to filepath, then renamed over it in one step,
+        # so readers always find either the previous or the new model, never a partial or missing file.
+        # The new file keeps the previous file's permissions, or gets rw-r--r-- (mkstemp makes it owner only).
+        if compress is None:
+            compress = _env('MODEL_COMPRESS', _compress, 0)
+        fd, temppath = mkstemp(dir=os.path.dirname(os.path.abspath(filepath)), suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as file:
+                dump({
+                    'format': ARTIFACT_FORMAT,
+                    'meta': self.meta(),
+                    'model': self.model,
+                }, file, compress=compress)
+            os.chmod(temppath, _file_mode(filepath))
+            os.replace(temppath, filepath)
+        except BaseException:
+            os.remove(temppath)
+            raise
+
+    @staticmethod
+    def artifact(filepath, mmap_mode: Optional[str] = None) -> dict:
+        """
+        Returns the content of a model file as a dict with keys format, meta
+        (features, labels, timestamp, rows, config, data_version, watermark,
+        selection) and model.
 
-    def save(self, filepath):
-        # Save the model to a file
-        dump(self.model, filepath)
+        mmap_mode ('r') memory maps the numpy arrays of uncompressed files
+        instead of reading them, and is ignored for compressed files.
+        Earlier layouts are upgraded on the fly: a bare estimator (format 0)
+        gets the default schema and the file's modification time, a flat dict
+        (format 1) has its metadata moved into meta.
+        """
+        if mmap_mode is not None and not _uncompressed(filepath):
+            mmap_mode = None
+        artifact = load(filepath, mmap_mode=mmap_mode)
+        if not isinstance(artifact, dict):
+            artifact = {
+                'format': 0,
+                'meta': {
+                    'features': list(getattr(artifact, 'feature_names_in_', FEATURES)),
+                    'labels': RANKS,
+                    'timestamp': datetime.fromtimestamp(os.path.getmtime(filepath)),
+                    'rows': None,
+                },
+                'model': artifact,
+            }
+        elif 'format' not in artifact:
+            model = artifact.pop('model')
+            artifact = {'format': 1, 'meta': artifact, 'model': model}
+        if artifact['format'] > ARTIFACT_FORMAT:
+            raise ValueError(f'Model file format {artifact["format"]} is newer than {ARTIFACT_FORMAT}')
+        return artifact
 
     @staticmethod
     def open(filepath):
-        model = load(filepath)
+        model = Machine.artifact(filepath)['model']
         return model
 
     def info(self):
         model_info = f'Base Model: {self.name}\n<br>Timestamp: {self.timestamp.strftime("%Y-%m-%d %I:%M:%S %p")}'
+        # Report the cross-validated score of a model promoted by model selection (see app.selection)
+        if self.selection:
+            model_info += (f'\n<br>Selected: {self.selection["family"]} out of {self.selection["candidates"]} candidates, '
+                           f'{self.selection["score"]:.2%} {self.selection["metric"]} over {self.selection["folds"]} folds')
         return model_info
@@ -1,14 +1,30 @@
 from base64 import b64decode
+from functools import partial
+import gzip
+from itertools import chain, product
+from json import dumps
+from math import ceil
 import os
+from threading import Thread
+from typing import Optional
+from urllib.parse import urlencode
 
+import click
+import numpy as np
 from Fortuna import random_int, random_float
 from MonsterLab import Monster
-from flask import Flask, render_template, request, redirect, url_for
-from pandas import DataFrame
-
-from app.data import Database
-from app.graph import chart
-from app.machine import Machine, PROJECT_ROOT
+from flask import Flask, Response, abort, jsonify, make_response, render_template, request, redirect, stream_with_context, url_for
+from pandas import DataFrame, read_csv, to_numeric
+from pandas.errors import EmptyDataError, ParserError
+
+from app.batching import MicroBatcher
+from app.cache import DatasetCache, PredictionCache, SpecCache
+from app.data import Database, FILTER_FIELDS, GROUP_FIELDS, PAGE_SIZE, SEED_BATCH, SORT_FIELDS, STAT_FIELDS
+from app.graph import chart, chart_csv, chart_query
+from app.jobs import TrainingJobs
+from app.machine import FEATURES, Machine, MODEL_PATH, TARGET, TrainingConfig, reservoir
+from app.registry import ModelRegistry
+from app.selection import select
 
 import logging
 
@@ -18,6 +34,194 @@ logging.basicConfig(filename='application.log', level=logging.DEBUG)
 SPRINT = 3
 APP = Flask(__name__)
 
+# Monster dataframes shared by /view and /model until the collection changes
+DATASETS = DatasetCache()
+
+# Rendered /view charts, for every x/y/target combination of VIEW_OPTIONS, until the collection changes.
+# Each cache takes at most VIEW_CACHE_MB megabytes, and unless VIEW_CHART_WARM is 0 every combination is
+# rendered in the background whenever the data changes.
+VIEW_OPTIONS = ["Level", "Health", "Energy", "Sanity", "Rarity"]
+CHARTS = SpecCache(maxbytes=int(os.getenv("VIEW_CACHE_MB", "128")) << 20)
+
+# Compressed rows of the /view charts, served by /view/data
+CHART_DATA = SpecCache(maxsize=128, maxbytes=int(os.getenv("VIEW_CACHE_MB", "128")) << 20)
+CHART_WARM = os.getenv("VIEW_CHART_WARM", "1") != "0"
+
+# JSON of the /data/groups, /data/histogram and /data/summary aggregations, until the collection changes
+STATS = SpecCache(maxsize=256, maxbytes=16 << 20)
+
+# Columns the Machine is trained on
+MODEL_COLUMNS = FEATURES + [TARGET]
+
+
+# How a full training reads the database (MODEL_TRAINING):
+#  memory - the whole collection as one dataframe (the default)
+#  sample - a uniform sample of MODEL_SAMPLE_SIZE rows, drawn while streaming the collection
+#  chunks - the whole collection, the forest growing one chunk at a time
+# The streamed modes read MODEL_CHUNK_SIZE rows at a time, so memory stays bounded whatever the collection size.
+TRAINING = os.getenv("MODEL_TRAINING", "memory")
+SAMPLE_SIZE = int(os.getenv("MODEL_SAMPLE_SIZE", "100000"))
+CHUNK_SIZE = int(os.getenv("MODEL_CHUNK_SIZE", "10000"))
+
+
+def train_machine(retrain: bool = False, config: TrainingConfig = None, selection: dict = None) -> Machine:
+    # Train a Machine on the full database, recording the version of the data it saw and its newest Monster.
+    # The watermark is read before the data is loaded (a cached dataframe comes with the watermark it was
+    # loaded at), so a Monster inserted while loading can be learned again by an update, but never skipped.
+    # config defaults to TrainingConfig.from_env(), selection is recorded with a config promoted by model selection.
+    db = Database()
+    watermark = db.watermark()
+    data_version = str(db.version())
+    if TRAINING == "sample":
+        df = reservoir(db.chunks(MODEL_COLUMNS, size=CHUNK_SIZE), SAMPLE_SIZE)
+        return Machine(df, retrain=True, config=config, data_version=data_version, watermark=watermark,
+                       selection=selection)
+    if TRAINING == "chunks":
+        # Spread the forest's trees over the chunks, so it ends up about config.n_estimators trees big.
+        # The labels are read up front (over the Rarity index), so a label missing from the first chunks is kept.
+        config = config or TrainingConfig.from_env()
+        chunks = max(1, ceil(db.collection.estimated_document_count() / CHUNK_SIZE))
+        return Machine.stream(
+            db.chunks(MODEL_COLUMNS, size=CHUNK_SIZE),
+            trees=ceil(config.n_estimators / chunks),
+            config=config,
+            data_version=data_version,
+            watermark=watermark,
+            labels=db.collection.distinct(TARGET),
+            selection=selection,
+        )
+    df, watermark = DATASETS.snapshot(db, MODEL_COLUMNS)
+    return Machine(df, retrain=retrain, config=config, data_version=data_version, watermark=watermark,
+                   selection=selection)
+
+
+def update_machine() -> Optional[Machine]:
+    # Grow a private copy of the saved Machine with the Monsters inserted since its watermark, and save it.
+    # Returns None when the Machine cannot be updated incrementally and needs a full rebuild.
+    db = Database()
+    try:
+        machine = Machine()
+    except FileNotFoundError:
+        return None
+    if machine.watermark is None:
+        return None
+    watermark = db.watermark()
+    data_version = str(db.version())
+    df = db.dataframe(columns=MODEL_COLUMNS, query=db.since(machine.watermark, watermark))
+    if df.empty:
+        return machine
+    if not machine.grow(df, data_version=data_version, watermark=watermark):
+        return None
+    machine.save(MODEL_PATH)
+    return machine
+
+
+def load_machine() -> Machine:
+    # Load the Machine from the model file alone, the database is only read when there is no model to load
+    try:
+        return Machine()
+    except FileNotFoundError:
+        return train_machine()
+
+
+# The Machine shared by every /model request of this worker
+MODELS = ModelRegistry(MODEL_PATH, load_machine)
+
+# Background retraining, one job at a time across every worker on the host. The jobs are shared in
+# MODEL_JOBS_DIR, next to the model file by default, so any worker can report the status of a job.
+JOBS = TrainingJobs(os.getenv("MODEL_JOBS_DIR", os.path.join(os.path.dirname(MODEL_PATH), "training_jobs")))
+
+# Model selection cross-validates the candidates on a sample of MODEL_SELECTION_ROWS Monsters,
+# over MODEL_SELECTION_FOLDS folds
+SELECTION_ROWS = int(os.getenv("MODEL_SELECTION_ROWS", "50000"))
+SELECTION_FOLDS = int(os.getenv("MODEL_SELECTION_FOLDS", "5"))
+
+# Rows scored per predict_proba pass by /model/batch
+BATCH_SIZE = 10_000
+
+# Optionally coalesce concurrent /model predictions into batches (threaded workers only),
+# enabled by a MODEL_BATCH_WINDOW_MS window, closed early at MODEL_BATCH_ROWS rows
+BATCH_WINDOW_MS = float(os.getenv("MODEL_BATCH_WINDOW_MS", "0"))
+BATCHER = MicroBatcher(
+    MODELS.get,
+    window=BATCH_WINDOW_MS / 1000,
+    max_rows=int(os.getenv("MODEL_BATCH_ROWS", "64")),
+) if BATCH_WINDOW_MS > 0 else None
+
+# Predictions of recently seen /model inputs, per model version: up to MODEL_CACHE_SIZE of them
+# (0 disables the cache), each served for MODEL_CACHE_TTL seconds (unset keeps them until evicted)
+CACHE_SIZE = int(os.getenv("MODEL_CACHE_SIZE", "4096"))
+CACHE_TTL = os.getenv("MODEL_CACHE_TTL")
+PREDICTIONS = PredictionCache(
+    maxsize=CACHE_SIZE,
+    ttl=float(CACHE_TTL) if CACHE_TTL else None,
+) if CACHE_SIZE > 0 else None
+
+
+def retrain_machine(rebuild: bool = False) -> None:
+    # Update the Machine with the new Monsters, or when asked (or when it cannot be updated) train a new one
+    # on the full database. Either way it is saved atomically over the model file, then shared.
+    # A model promoted by model selection is rebuilt with its own config, and stays promoted.
+    machine = None if rebuild else update_machine()
+    if machine is None:
+        current = MODELS.get()
+        if current.selection:
+            machine = train_machine(retrain=True, config=current.config, selection=current.selection)
+        else:
+            machine = train_machine(retrain=True)
+    MODELS.publish(machine)
+    # The data was just read, render the charts of this version of it while it is cached
+    if CHART_WARM:
+        warm_charts()
+
+
+def render_chart(db: Database, x: str, y: str, target: str) -> str:
+    # Render the /view chart of one axis/target combination as a Vega-Lite JSON spec, loading its data
+    # from /view/data. The URL is relative to the /view page, so it holds under any mount point.
+    df = DATASETS.get(db, VIEW_OPTIONS)
+    url = "view/data"
+    query = chart_query(len(df), x, y, target)
+    if query:
+        url += "?" + urlencode(query)
+    return chart(df=df, x=x, y=y, target=target, url=url).to_json()
+
+
+def chart_data_key(query) -> tuple:
+    # The x, y and target of the /view/data rows for a chart_query(), defaulting to the /view defaults
+    return query.get("x") or VIEW_OPTIONS[1], query.get("y") or VIEW_OPTIONS[2], query.get("target") or VIEW_OPTIONS[4]
+
+
+def render_chart_data(db: Database, x: str, y: str, target: str) -> bytes:
+    # Render the rows of a /view chart as gzip compressed CSV
+    return chart_csv(DATASETS.get(db, VIEW_OPTIONS), x, y, target)
+
+
+def warm_charts(version: tuple = None) -> None:
+    # Render the chart, and its rows, of every axis/target combination into CHARTS and CHART_DATA,
+    # for the current version of the data.
+    # Stops early once the data changes again, the next /view request starts over for the new version.
+    db = Database()
+    version = version or db.version()
+    for x, y, target in product(VIEW_OPTIONS, repeat=3):
+        if db.version() != version:
+            return
+        CHARTS.get((x, y, target), version, partial(render_chart, db, x, y, target))
+        key = chart_data_key(chart_query(len(DATASETS.get(db, VIEW_OPTIONS)), x, y, target))
+        CHART_DATA.get(key, version, partial(render_chart_data, db, *key))
+
+
+def select_machine() -> None:
+    # Race the candidate estimators on (a sample of) the database, then train the winner on all of it,
+    # record its cross-validated score, save it atomically over the model file and share it
+    db = Database()
+    data_version = str(db.version())
+    df, watermark = DATASETS.snapshot(db, MODEL_COLUMNS)
+    result = select(df.sample(n=min(len(df), SELECTION_ROWS), random_state=42), folds=SELECTION_FOLDS)
+    # Saved once, with its selection record, so no other worker can load the model without it
+    machine = Machine(df, retrain=True, config=result["config"], data_version=data_version, watermark=watermark,
+                      selection=result["selection"])
+    MODELS.publish(machine)
+
 
 @APP.route("/")
 def home():
@@ -34,13 +238,95 @@ def data():
     if SPRINT < 1:
         return render_template("data.html")
     db = Database()
+
+    # One keyset page at a time, never the whole collection
+    query = filter_query()
+    sort = request.args.get("sort")
+    if sort not in SORT_FIELDS:
+        sort = "_id"
+    order = request.args.get("order", "asc")
+    limit = max(1, min(request.args.get("limit", type=int) or PAGE_SIZE, 100))
+    try:
+        page = db.page(
+            query=query,
+            sort=sort,
+            descending=order == "desc",
+            limit=limit,
+            after=request.args.get("after"),
+            before=request.args.get("before"),
+        )
+    except ValueError:
+        abort(400)
+
+    params = {field.lower(): value for field, value in query.items()}
+    params.update(sort=sort, order=order, limit=limit)
     return render_template(
         "data.html",
-        count=db.count(),
-        table=db.html_table(),
+        count=db.count(query),
+        table=db.html_table(page["records"]),
+        sort_fields=SORT_FIELDS,
+        filter_fields=FILTER_FIELDS,
+        params=params,
+        next_url=url_for("data", after=page["next"], **params) if page["next"] else None,
+        prev_url=url_for("data", before=page["prev"], **params) if page["prev"] else None,
     )
 
 
+def filter_query() -> dict:
+    # The FILTER_FIELDS a request filters the Monsters on, e.g. ?type=Undead&rarity=Rank 1
+    return {
+        field: request.args[field.lower()]
+        for field in FILTER_FIELDS
+        if request.args.get(field.lower())
+    }
+
+
+def serve_stats(key: tuple, aggregate) -> Response:
+    # Serve the result of aggregate(db) as JSON. It is computed by the server once per version of the data
+    # (and filters, in key), then served from STATS, and revalidated with its ETag.
+    db = Database()
+    try:
+        body, etag = STATS.get(key, db.version(), lambda: dumps(aggregate(db)))
+    except ValueError:
+        abort(400)
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+    else:
+        response = Response(body, mimetype="application/json")
+    response.set_etag(etag)
+    response.cache_control.no_cache = True
+    return response
+
+
+@APP.route("/data/groups")
+def data_groups():
+    # The number of Monsters, and their mean stats, per value of ?by= (Type, Rarity or Level)
+    field = request.args.get("by", "Rarity")
+    if field not in GROUP_FIELDS:
+        abort(400)
+    query = filter_query()
+    return serve_stats(("groups", field, *sorted(query.items())), partial(Database.groups, field=field, query=query))
+
+
+@APP.route("/data/histogram")
+def data_histogram():
+    # The number of Monsters per bin of ?field= (Level, Health, Energy or Sanity), in ?bins= equal width bins
+    field = request.args.get("field", "Health")
+    bins = request.args.get("bins", 10, type=int)
+    if field not in STAT_FIELDS or not 1 <= bins <= 100:
+        abort(400)
+    query = filter_query()
+    return serve_stats(("histogram", field, bins, *sorted(query.items())),
+                       partial(Database.histogram, field=field, bins=bins, query=query))
+
+
+@APP.route("/data/summary")
+def data_summary():
+    # The count, and the min, max, mean and standard deviation of every stat, of the Monsters
+    query = filter_query()
+    return serve_stats(("summary", *sorted(query.items())), partial(Database.summary, query=query))
+
+
 @APP.route("/view", methods=["GET", "POST"])
 def view():
     if SPRINT < 2:
@@ -48,28 +334,67 @@ def view():
 
     db = Database()
 
-    options = ["Level", "Health", "Energy", "Sanity", "Rarity"]
+    options = VIEW_OPTIONS
 
     x_axis = request.values.get("x_axis") or options[1]
     y_axis = request.values.get("y_axis") or options[2]
     target = request.values.get("target") or options[4]
-
-    graph = chart(
-        df=db.dataframe(),
-        x=x_axis,
-        y=y_axis,
-        target=target,
-    ).to_json()
-
-    return render_template(
-        "view.html",
-        options=options,
-        x_axis=x_axis,
-        y_axis=y_axis,
-        target=target,
-        count=db.count(),
-        graph=graph,
-    )
+    if not {x_axis, y_axis, target} <= set(options):
+        abort(400)
+
+    # The chart is rendered once per combination and version of the data. A new version starts
+    # rendering every other combination in the background.
+    version = db.version()
+    graph, etag = CHARTS.get((x_axis, y_axis, target), version, partial(render_chart, db, x_axis, y_axis, target))
+    if CHART_WARM and CHARTS.warming(version):
+        Thread(target=warm_charts, args=(version,), name="chart-warmer", daemon=True).start()
+
+    # Unchanged pages are revalidated with their ETag, and answered with 304 Not Modified
+    count = db.count()
+    etag = f"{etag}-{count}"
+    if request.method == "GET" and request.if_none_match.contains(etag):
+        response = Response(status=304)
+    else:
+        response = make_response(render_template(
+            "view.html",
+            options=options,
+            x_axis=x_axis,
+            y_axis=y_axis,
+            target=target,
+            count=count,
+            graph=graph,
+        ))
+    response.set_etag(etag)
+    response.cache_control.no_cache = True
+    return response
+
+
+@APP.route("/view/data")
+def view_data():
+    # The rows of a /view chart, as gzip compressed CSV, with only the VIEW_OPTIONS columns. Charts drawing the
+    # same rows share an URL (see chart_query()), so the browser fetches them once, and revalidates them with
+    # their ETag, when switching axes.
+    key = chart_data_key(request.args)
+    if not set(key) <= set(VIEW_OPTIONS):
+        abort(400)
+
+    # Clients that do not accept gzip get the CSV decompressed, cached as its own representation (and ETag).
+    db = Database()
+    version = db.version()
+    body, etag = CHART_DATA.get(key, version, partial(render_chart_data, db, *key))
+    gzipped = "gzip" in request.accept_encodings
+    if not gzipped:
+        body, etag = CHART_DATA.get(("identity",) + key, version, partial(gzip.decompress, body))
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+    else:
+        response = Response(body, mimetype="text/csv")
+        if gzipped:
+            response.content_encoding = "gzip"
+    response.set_etag(etag)
+    response.cache_control.no_cache = True
+    response.vary.add("Accept-Encoding")
+    return response
 
 
 @APP.route("/model", methods=["GET", "POST"])
@@ -82,16 +407,11 @@ def model():
 
     else:
         # Setup:
-        # Create a database instance and dataframe instance.
-        db = Database()
-        df = db.dataframe()
-
-
-        # Create a Machine instance.
-        # (In __init__(), Try to load an existing model. If no model exists, train one).
-        # Use __init__() with open(). OR train a model and save it with save(). Fill in machine attributes using
+        # Get the Machine shared by this worker.
+        # (The registry loads it once with Machine.__init__(), which loads an existing model or trains one,
+        # and reloads it when the model file changes). Fill in machine attributes using
         # the model (loaded or created) and info().
-        machine = Machine(df)
+        machine, version = MODELS.current()
 
 
         # Assign the variables to load the page:
@@ -106,38 +426,30 @@ def model():
         # Make a Prediction.
         # If no values are present in the form, give random numbers. And immediately use those random
         # numbers to predict Rarity with a confidence number using the existing model (either loaded or trained).
-        # Use __call__() to make a prediction
-
-        options = ["Level", "Health", "Energy", "Sanity", "Rarity"]
-        prediction, confidence = machine(DataFrame([dict(zip(options, (level, health, energy, sanity)))]))
+        # Use predict_one() to make a prediction through the flattened forest.
+        # Inputs seen before with the same model version are answered from PREDICTIONS.
+        predict = BATCHER.predict if BATCHER is not None else machine.predict_one
+        row = (level, health, energy, sanity)
+        if PREDICTIONS is not None:
+            prediction, confidence = PREDICTIONS.get(version, row, predict)
+        else:
+            prediction, confidence = predict(row)
         string_prediction = machine.labels[prediction]
 
 
         # Make a new Prediction.
         # Option A - yes retrain)
-        # If the user changes those numbers and clicks the button ‘Retrain’, then create a new model
-        # (with the full database), save it, make a prediction (with the input numbers) and return that prediction.
-        # Delete the model.
-        # Then create a new Machine instance
+        # If the user clicks the button ‘Retrain’, queue a background job that grows the model with the
+        # Monsters added since it was trained (or, with ‘Full rebuild’, creates a new model with the full
+        # database), saves it and shares it once it is ready.
+        # The request returns right away, and the current model keeps serving predictions until then.
         retrain = request.form.get('retrain')
+        rebuild = request.form.get('rebuild') == 'True'
+        job_id = JOBS.active()
 
         if retrain == 'True':
             # Checkbox was checked
-            filepath = os.path.join(PROJECT_ROOT, 'app', 'model.joblib')
-
-            # Check if the model file exists, then delete it
-            if os.path.exists(filepath):
-                os.remove(filepath)
-
-                machine.retrain(df)
-
-                options = ["Level", "Health", "Energy", "Sanity", "Rarity"]
-                prediction, confidence = machine(DataFrame([dict(zip(options, (level, health, energy, sanity)))]))
-                string_prediction = machine.labels[prediction]
-
-            else:
-                #
-                pass
+            job_id = JOBS.submit(partial(retrain_machine, rebuild=rebuild))
 
         else:
             # Checkbox was not checked
@@ -157,7 +469,106 @@ def model():
             sanity=sanity,
             prediction=string_prediction,
             confidence=f"{confidence:.2%}",
+            job=JOBS.status(job_id) if job_id else None,
         )
 
+
+@APP.route("/model/batch", methods=["POST"])
+def model_batch():
+    # Score many Monsters in one request. Post a JSON list of Monsters, or a CSV with a header row
+    # (Content-Type: text/csv). They are read and scored BATCH_SIZE rows at a time, one forest pass per batch,
+    # and streamed back with their predicted Rarity and Confidence as JSON lines, or as CSV.
+    # Every Monster must have every feature, as a number. The JSON Monsters, and the first CSV chunk (whose
+    # header all the chunks share), are checked before the response starts, and rejected with 400.
+    # A later CSV chunk that cannot be scored ends the stream with an error line.
+    machine = MODELS.get()
+    as_csv = request.mimetype == "text/csv"
+    try:
+        if as_csv:
+            batches = iter(read_csv(request.stream, chunksize=BATCH_SIZE))
+            first = next(batches, None)
+        else:
+            records = request.get_json(silent=True)
+            if isinstance(records, dict):
+                records = [records]
+            features = set(machine.feature_names)
+            if not isinstance(records, list) or not all(
+                    isinstance(record, dict) and features <= record.keys() for record in records):
+                abort(400)
+            df = batch_features(machine, DataFrame(records)) if records else None
+            batches = (df.iloc[i:i + BATCH_SIZE] for i in range(BATCH_SIZE, len(records), BATCH_SIZE))
+            first = df.iloc[:BATCH_SIZE] if records else None
+        if as_csv and first is not None:
+            first = batch_features(machine, first)
+    except (EmptyDataError, ParserError, KeyError, ValueError, TypeError):
+        abort(400)
+    labels = np.asarray(machine.labels)
+
+    def score():
+        for number, batch in enumerate(chain([first], batches) if first is not None else ()):
+            try:
+                if as_csv and number:
+                    batch = batch_features(machine, batch)
+                predictions, confidences = machine.predict_batch(batch)
+            except (ParserError, KeyError, ValueError, TypeError) as error:
+                message = f"Monsters {number * BATCH_SIZE} and after cannot be scored: {error}"
+                yield f"# error: {message}\n" if as_csv else dumps({"error": message}) + "\n"
+                return
+            batch = batch.assign(**{TARGET: labels[predictions], "Confidence": confidences})
+            if as_csv:
+                yield batch.to_csv(index=False, header=number == 0)
+            else:
+                yield batch.to_json(orient="records", lines=True).rstrip("\n") + "\n"
+
+    mimetype = "text/csv" if as_csv else "application/x-ndjson"
+    return Response(stream_with_context(score()), mimetype=mimetype)
+
+
+def batch_features(machine: Machine, batch: DataFrame) -> DataFrame:
+    # The batch with its feature columns as numbers, raising KeyError for a missing feature
+    # and ValueError for a value that is not a number
+    return batch.assign(**{
+        feature: to_numeric(batch[feature], errors="raise") for feature in machine.feature_names
+    })
+
+
+@APP.route("/model/select", methods=["POST"])
+def model_select():
+    # Queue a model selection job, which promotes the best candidate estimator once it is done
+    job_id = JOBS.submit(select_machine)
+    return jsonify(JOBS.status(job_id)), 202
+
+
+@APP.route("/model/jobs/<job_id>")
+def model_job(job_id):
+    # Poll the status of a retraining job
+    job = JOBS.status(job_id)
+    if job is None:
+        abort(404)
+    return jsonify(job)
+
+
+@APP.route("/model/cache")
+def model_cache():
+    # Hit rate and size of the prediction cache
+    if PREDICTIONS is None:
+        abort(404)
+    return jsonify(PREDICTIONS.stats())
+
+@APP.cli.command("seed")
+@click.argument("amount", type=int)
+@click.option("--batch-size", type=int, default=SEED_BATCH, help="Monsters per insert.")
+@click.option("--workers", type=int, default=None, help="Generating processes, one per core but one by default.")
+@click.option("--window", type=int, default=4, help="Batches generated ahead, and inserted at a time.")
+def seed(amount, batch_size, workers, window):
+    """ Seed the database with AMOUNT Monsters, reporting progress and docs/sec. """
+    def progress(inserted, seconds):
+        click.echo(f"{inserted:>10,}/{amount:,} Monsters  {inserted / seconds:>10,.0f} docs/s", err=True)
+
+    if not Database().seed(amount, batch_size=batch_size, workers=workers, window=window, progress=progress):
+        raise click.ClickException("The inserts were not acknowledged")
+
+
 if __name__ == '__main__':
+    Database().ensure_indexes()
     APP.run(debug=True)
@@ -0,0 +1,109 @@
+import os
+from hashlib import sha256
+from threading import Lock
+from time import monotonic
+from typing import Callable, Optional, Tuple
+
+from app.machine import Machine
+
+
+class ModelRegistry:
+    """
+    Per-worker registry of the shared, read-only Machine.
+
+    The model artifact is loaded once per worker and the same Machine is
+    handed to every request, so a prediction costs only the inference. The
+    artifact's mtime and size are checked at most every interval seconds;
+    when they change and the content hash differs, the Machine is reloaded
+    (hot reload after a retrain, in this worker or another one).
+
+    Requests must not mutate the shared Machine. A new model is built as a
+    new Machine and installed with publish().
+
+    Instance Attributes:
+    ---------
+    self.filepath : str
+        The model artifact to watch.
+    self.factory : Callable[[], Machine]
+        Builds the Machine, loading the artifact (or training one when missing).
+    self.interval : float
+        Seconds between two checks of the artifact.
+    self.version : str
+        The content hash of the artifact the current Machine was loaded from.
+    """
+
+    def __init__(self, filepath: str, factory: Callable[[], Machine], interval: float = 1.0) -> None:
+        self.filepath = filepath
+        self.factory = factory
+        self.interval = interval
+        self.version = None
+        self._machine = None
+        self._signature = None
+        self._checked = float("-inf")
+        self._lock = Lock()
+
+    def get(self) -> Machine:
+        """
+        Returns the shared Machine, loading or reloading it when needed.
+
+        :return: Machine, the current model.
+        """
+        return self.current()[0]
+
+    def current(self) -> Tuple[Machine, str]:
+        """
+        Returns the shared Machine with its version, read together, so a
+        publish() racing the call can never pair one model with the other's
+        version (e.g. as a prediction cache key).
+
+        :return: Tuple, of the current Machine and its version.
+        """
+        with self._lock:
+            now = monotonic()
+            if self._machine is None:
+                self._load()
+            elif now - self._checked >= self.interval:
+                signature = self._stat()
+                # A missing artifact keeps the current Machine
+                if signature is not None and signature != self._signature:
+                    if self._hash() != self.version:
+                        self._load()
+                    else:
+                        self._signature = signature
+            self._checked = now
+            return self._machine, self.version
+
+    def publish(self, machine: Machine) -> None:
+        """
+        Installs a newly built Machine whose artifact is already saved.
+
+        :param machine: Machine, the new model.
+        :return: None
+        """
+        with self._lock:
+            self._machine = machine
+            self._signature = self._stat()
+            self.version = self._hash()
+            self._checked = monotonic()
+
+    def _load(self) -> None:
+        self._machine = self.factory()
+        self._signature = self._stat()
+        self.version = self._hash()
+
+    def _stat(self) -> Optional[Tuple[int, int]]:
+        try:
+            stat = os.stat(self.filepath)
+        except FileNotFoundError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def _hash(self) -> Optional[str]:
+        digest = sha256()
+        try:
+            with open(self.filepath, 'rb') as file:
+                for block in iter(lambda: file.read(1 << 20), b''):
+                    digest.update(block)
+        except FileNotFoundError:
+            return None
+        return digest.hexdigest()[:16]
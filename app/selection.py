@@ -0,0 +1,114 @@
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import replace
+from math import ceil
+from multiprocessing import get_context
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+from pandas import DataFrame
+from sklearn.metrics import accuracy_score
+from sklearn.model_selection import ParameterGrid, StratifiedKFold
+from sklearn.preprocessing import LabelEncoder
+
+from app.machine import FEATURES, TARGET, TrainingConfig
+
+# The parameter grid searched for each estimator family, as TrainingConfig fields
+# (params holds the family's own constructor arguments)
+GRID = {
+    'random_forest': {'n_estimators': [100, 300], 'max_depth': [None, 12]},
+    'extra_trees': {'n_estimators': [100, 300], 'max_depth': [None, 12]},
+    'gradient_boosting': {'params': [
+        {'max_iter': 100, 'learning_rate': 0.1},
+        {'max_iter': 300, 'learning_rate': 0.05},
+    ]},
+}
+
+# The data and cross-validation folds of a selection, set once per worker process
+_X = _y = _folds = None
+
+
+def candidates(grid: Dict[str, Dict] = None, base: TrainingConfig = None) -> List[TrainingConfig]:
+    """
+    Expands a parameter grid into one TrainingConfig per candidate.
+
+    :param grid: Dict, family to {TrainingConfig field: values}. Defaults to GRID.
+    :param base: TrainingConfig, the fields left out of the grid. Defaults to TrainingConfig.from_env().
+    :return: List[TrainingConfig], the candidates.
+    """
+    base = base or TrainingConfig.from_env()
+    return [
+        replace(base, family=family, **point)
+        for family, space in (grid or GRID).items()
+        for point in ParameterGrid(space)
+    ]
+
+
+def select(df: DataFrame,
+           configs: Iterable[TrainingConfig] = None,
+           folds: int = 5,
+           keep: float = 0.5,
+           workers: Optional[int] = None,
+           random_state: int = 42) -> Dict:
+    """
+    Picks the best candidate by cross-validated accuracy on df.
+
+    The candidates are raced over the folds: every fold round scores the
+    surviving candidates in parallel across a process pool, then only the
+    best keep fraction of them (by mean accuracy so far) runs the next fold,
+    so clear losers stop after a single fit. The folds are split once and
+    sent to each worker process once, with the data, when it starts; a task
+    only carries its candidate and fold number.
+
+    Candidates fit on a single core each (n_jobs=1), the pool provides the
+    parallelism.
+
+    :param df: DataFrame, Monsters with the FEATURES and TARGET columns.
+    :param configs: Iterable[TrainingConfig], the candidates. Defaults to candidates().
+    :param folds: int, the number of stratified cross-validation folds.
+    :param keep: float, the fraction of candidates kept after each fold round.
+    :param workers: int, the number of worker processes. Defaults to the number of cores.
+    :param random_state: int, seeds the folds.
+    :return: Dict, with the winning config, and the selection summary (family, score,
+        metric, folds, candidates, and rounds: the folds each candidate ran) to record with the model.
+    """
+    configs = list(configs if configs is not None else candidates())
+    X = df[FEATURES].to_numpy(dtype=np.float32)
+    y = LabelEncoder().fit_transform(df[TARGET])
+    splits = list(StratifiedKFold(folds, shuffle=True, random_state=random_state).split(X, y))
+
+    scores = [[] for _ in configs]
+    alive = list(range(len(configs)))
+    with ProcessPoolExecutor(workers, mp_context=get_context('spawn'),
+                             initializer=_init, initargs=(X, y, splits)) as pool:
+        for fold in range(folds):
+            futures = [pool.submit(_score, index, replace(configs[index], n_jobs=1), fold) for index in alive]
+            for future in as_completed(futures):
+                index, score = future.result()
+                scores[index].append(score)
+            alive.sort(key=lambda index: np.mean(scores[index]), reverse=True)
+            if fold < folds - 1:
+                alive = alive[:max(1, ceil(len(alive) * keep))]
+
+    best = alive[0]
+    return {
+        'config': configs[best],
+        'selection': {
+            'family': configs[best].family,
+            'score': float(np.mean(scores[best])),
+            'metric': 'accuracy',
+            'folds': len(scores[best]),
+            'candidates': len(configs),
+            'rounds': [len(score) for score in scores],
+        },
+    }
+
+
+def _init(X: np.ndarray, y: np.ndarray, splits: List) -> None:
+    global _X, _y, _folds
+    _X, _y, _folds = X, y, splits
+
+
+def _score(index: int, config: TrainingConfig, fold: int):
+    train, test = _folds[fold]
+    model = config.estimator().fit(_X[train], _y[train])
+    return index, accuracy_score(_y[test], model.predict(_X[test]))
@@ -0,0 +1,64 @@
+"""
+Benchmark of the model file: size, load time and memory of Machine.load()
+for several compress settings, with and without memory mapping.
+
+Each load runs in a fresh interpreter; memory is the growth of its resident
+set size (Linux /proc/self/statm) over the imports alone.
+
+    python -m benchmarks.bench_artifact [--rows 20000] [--trees 100] [--compress 0 3 zlib:9 lz4]
+"""
+import subprocess
+import sys
+from argparse import ArgumentParser
+from os.path import getsize
+from tempfile import TemporaryDirectory
+
+from MonsterLab import Monster
+from pandas import DataFrame
+
+from app.machine import FEATURES, TARGET, Machine, TrainingConfig, _compress
+
+LOAD = """
+import os, sys, time
+from app.machine import Machine
+def rss():
+    with open('/proc/self/statm') as statm:
+        return int(statm.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+before = rss()
+start = time.perf_counter()
+machine = Machine.__new__(Machine)
+machine.load(sys.argv[1], mmap_mode=sys.argv[2] if sys.argv[2] != 'None' else None)
+seconds = time.perf_counter() - start
+print(seconds, (rss() - before) / 2**20)
+"""
+
+
+def measure(filepath: str, mmap_mode: str):
+    output = subprocess.run(
+        [sys.executable, '-W', 'ignore', '-c', LOAD, filepath, str(mmap_mode)],
+        capture_output=True, text=True, check=True,
+    ).stdout.split()
+    return float(output[0]), float(output[1])
+
+
+if __name__ == '__main__':
+    parser = ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=20_000)
+    parser.add_argument("--trees", type=int, default=100)
+    parser.add_argument("--compress", nargs="+", default=["0", "3", "zlib:9", "lz4"])
+    args = parser.parse_args()
+
+    df = DataFrame([Monster().to_dict() for _ in range(args.rows)])[FEATURES + [TARGET]]
+    print(f"{'compress':>9} {'mmap':>5} {'size (MB)':>10} {'load (s)':>9} {'RSS (MB)':>9}")
+    with TemporaryDirectory() as directory:
+        filepath = f'{directory}/model.joblib'
+        machine = Machine(df, filepath=filepath, retrain=True, config=TrainingConfig(n_estimators=args.trees))
+        for setting in args.compress:
+            try:
+                machine.save(filepath, compress=_compress(setting))
+            except ValueError as error:
+                print(f"{setting:>9} skipped: {error}")
+                continue
+            for mmap_mode in ([None, 'r'] if setting == '0' else [None]):
+                seconds, rss = measure(filepath, mmap_mode)
+                print(f"{setting:>9} {str(mmap_mode):>5} {getsize(filepath) / 2**20:>10.1f} {seconds:>9.3f} {rss:>9.1f}")
@@ -0,0 +1,66 @@
+"""
+Benchmark of /model style single-row predictions under concurrency: direct
+Machine calls against the MicroBatcher at several windows, reporting
+throughput and p50/p99 latency.
+
+    python -m benchmarks.bench_batching [--threads 16] [--seconds 5] [--windows 1 2 5]
+"""
+from argparse import ArgumentParser
+from random import randint, uniform
+from tempfile import TemporaryDirectory
+from threading import Event, Thread
+from time import perf_counter, sleep
+
+import numpy as np
+from MonsterLab import Monster
+from pandas import DataFrame
+
+from app.batching import MicroBatcher
+from app.machine import FEATURES, TARGET, Machine, TrainingConfig
+
+
+def load(predict, threads: int, seconds: float):
+    stop = Event()
+    latencies = [[] for _ in range(threads)]
+
+    def client(record):
+        while not stop.is_set():
+            row = (randint(1, 20), uniform(1, 250), uniform(1, 250), uniform(1, 250))
+            start = perf_counter()
+            predict(row)
+            record.append(perf_counter() - start)
+
+    workers = [Thread(target=client, args=(latencies[i],)) for i in range(threads)]
+    for worker in workers:
+        worker.start()
+    sleep(seconds)
+    stop.set()
+    for worker in workers:
+        worker.join()
+    latencies = np.concatenate([np.asarray(record) for record in latencies]) * 1000
+    return len(latencies) / seconds, np.percentile(latencies, 50), np.percentile(latencies, 99)
+
+
+if __name__ == '__main__':
+    parser = ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--seconds", type=float, default=5)
+    parser.add_argument("--windows", type=float, nargs="+", default=[1, 2, 5])
+    parser.add_argument("--rows", type=int, default=64)
+    args = parser.parse_args()
+
+    df = DataFrame([Monster().to_dict() for _ in range(10_000)])[FEATURES + [TARGET]]
+    with TemporaryDirectory() as directory:
+        machine = Machine(df, filepath=f'{directory}/model.joblib', config=TrainingConfig())
+
+    def direct(row):
+        return machine(DataFrame([dict(zip(FEATURES, row))]))
+
+    print(f"{'mode':>14} {'req/s':>8} {'p50 (ms)':>9} {'p99 (ms)':>9} {'rows/batch':>11}")
+    throughput, p50, p99 = load(direct, args.threads, args.seconds)
+    print(f"{'direct':>14} {throughput:>8.0f} {p50:>9.2f} {p99:>9.2f} {1:>11.1f}")
+    for window in args.windows:
+        batcher = MicroBatcher(lambda: machine, window=window / 1000, max_rows=args.rows)
+        throughput, p50, p99 = load(batcher.predict, args.threads, args.seconds)
+        mode = f'batch {window:g} ms'
+        print(f"{mode:>14} {throughput:>8.0f} {p50:>9.2f} {p99:>9.2f} {batcher.rows / batcher.batches:>11.1f}")
@@ -0,0 +1,79 @@
+"""
+Benchmark of Database.dataframe(): the list of dicts path against the
+columnar (pymongoarrow) path, at 10k, 100k and 1M Monsters.
+
+By default the client side decode of the very BSON bytes a cursor receives
+is timed, so no database is needed. With --live a scratch collection on
+DB_URL is seeded and both paths are timed end to end, wire included.
+
+    python -m benchmarks.bench_dataframe [--live] [--sizes 10000 100000 1000000]
+"""
+from argparse import ArgumentParser
+from itertools import islice, cycle
+from time import perf_counter
+
+from bson import decode_all, encode
+from MonsterLab import Monster
+from pandas import DataFrame
+from pymongoarrow.api import Schema
+from pymongoarrow.context import PyMongoArrowContext
+
+from app.data import Database, SCHEMA
+
+SIZES = (10_000, 100_000, 1_000_000)
+SAMPLE = 10_000
+
+
+def monsters(amount: int):
+    """ Yields amount Monster dicts, cycling over a sample to keep generation cheap. """
+    sample = [Monster().to_dict() for _ in range(min(amount, SAMPLE))]
+    return (dict(record) for record in islice(cycle(sample), amount))
+
+
+def timed(function, *args):
+    start = perf_counter()
+    result = function(*args)
+    return perf_counter() - start, result
+
+
+def dicts_offline(raw: bytes) -> DataFrame:
+    return DataFrame(decode_all(raw))
+
+
+def columnar_offline(raw: bytes) -> DataFrame:
+    context = PyMongoArrowContext(Schema(SCHEMA), allow_invalid=True)
+    context.process_bson_stream(raw)
+    return context.finish().to_pandas()
+
+
+def offline(amount: int):
+    raw = b"".join(encode(record) for record in monsters(amount))
+    dicts, _ = timed(dicts_offline, raw)
+    columnar, _ = timed(columnar_offline, raw)
+    return dicts, columnar
+
+
+def live(amount: int):
+    db = Database()
+    db.collection = db.db["Benchmark"]
+    db.collection.drop()
+    records = monsters(amount)
+    while batch := list(islice(records, SAMPLE)):
+        db.collection.insert_many(batch, ordered=False)
+    dicts, _ = timed(lambda: DataFrame(list(db.read_many({}))))
+    columnar, _ = timed(db.columnar)
+    db.collection.drop()
+    return dicts, columnar
+
+
+if __name__ == '__main__':
+    parser = ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--live", action="store_true", help="time against the DB_URL database")
+    parser.add_argument("--sizes", type=int, nargs="+", default=SIZES)
+    args = parser.parse_args()
+
+    bench = live if args.live else offline
+    print(f"{'rows':>10} {'dicts (s)':>10} {'columnar (s)':>13} {'speedup':>8}")
+    for size in args.sizes:
+        dicts, columnar = bench(size)
+        print(f"{size:>10} {dicts:>10.3f} {columnar:>13.3f} {dicts / columnar:>7.1f}x")
@@ -0,0 +1,35 @@
+"""
+Benchmark of single-row prediction latency: Machine.__call__ on a one-row
+DataFrame (scikit-learn path) against Machine.predict_one on a plain tuple
+(flattened forest).
+
+    python -m benchmarks.bench_forest [--trees 100] [--calls 2000]
+"""
+from argparse import ArgumentParser
+from random import randint, uniform
+from tempfile import TemporaryDirectory
+from timeit import repeat
+
+from MonsterLab import Monster
+from pandas import DataFrame
+
+from app.machine import FEATURES, TARGET, Machine, TrainingConfig
+
+if __name__ == '__main__':
+    parser = ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--trees", type=int, default=100)
+    parser.add_argument("--calls", type=int, default=2000)
+    args = parser.parse_args()
+
+    df = DataFrame([Monster().to_dict() for _ in range(10_000)])[FEATURES + [TARGET]]
+    with TemporaryDirectory() as directory:
+        machine = Machine(df, filepath=f'{directory}/model.joblib', config=TrainingConfig(n_estimators=args.trees))
+    row = (randint(1, 20), uniform(1, 250), uniform(1, 250), uniform(1, 250))
+
+    sklearn = min(repeat(lambda: machine(DataFrame([dict(zip(FEATURES, row))])), number=args.calls // 20, repeat=3))
+    flat = min(repeat(lambda: machine.predict_one(row), number=args.calls, repeat=3))
+    sklearn = sklearn / (args.calls // 20) * 1e6
+    flat = flat / args.calls * 1e6
+    print(f"trees: {args.trees}, depth: {machine.forest.depth}")
+    print(f"{'DataFrame + scikit-learn':>26}: {sklearn:>9.1f} us")
+    print(f"{'flattened forest':>26}: {flat:>9.1f} us ({sklearn / flat:.0f}x)")
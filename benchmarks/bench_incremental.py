@@ -0,0 +1,62 @@
+"""
+Benchmark of incremental retraining: wall time and holdout accuracy of a
+full retrain on all the Monsters against Machine.grow() on the Monsters
+added since the last fit only.
+
+The Monsters are generated with MonsterLab, no database is needed.
+
+    python -m benchmarks.bench_incremental [--sizes 10000 100000] [--added 500]
+                                           [--trees 100] [--jobs -1]
+"""
+from argparse import ArgumentParser
+from tempfile import TemporaryDirectory
+from time import perf_counter
+
+from MonsterLab import Monster
+from pandas import DataFrame, concat
+from sklearn.metrics import accuracy_score
+
+from app.machine import FEATURES, TARGET, Machine, TrainingConfig
+
+SIZES = (10_000, 100_000)
+
+
+def monsters(amount: int) -> DataFrame:
+    return DataFrame([Monster().to_dict() for _ in range(amount)])[FEATURES + [TARGET]]
+
+
+def accuracy(machine: Machine, test: DataFrame) -> float:
+    predicted = [machine.labels[code] for code in machine.model.predict(test[FEATURES])]
+    return accuracy_score(test[TARGET], predicted)
+
+
+if __name__ == '__main__':
+    parser = ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=SIZES)
+    parser.add_argument("--added", type=int, default=500)
+    parser.add_argument("--trees", type=int, default=100)
+    parser.add_argument("--jobs", type=int, default=-1)
+    args = parser.parse_args()
+
+    config = TrainingConfig(n_estimators=args.trees, n_jobs=args.jobs)
+    test = monsters(10_000)
+    print(f"{'rows':>8} {'added':>6} {'mode':>8} {'fit (s)':>8} {'speedup':>8} {'trees':>6} {'accuracy':>9}")
+    with TemporaryDirectory() as directory:
+        filepath = f'{directory}/model.joblib'
+        for size in args.sizes:
+            old, new = monsters(size), monsters(args.added)
+
+            start = perf_counter()
+            full = Machine(concat([old, new]), filepath=filepath, retrain=True, config=config)
+            rebuild = perf_counter() - start
+
+            machine = Machine(old, filepath=filepath, retrain=True, config=config)
+            start = perf_counter()
+            machine.grow(new)
+            machine.save(filepath)
+            grow = perf_counter() - start
+
+            trees = len(full.model.estimators_)
+            print(f"{size:>8} {args.added:>6} {'full':>8} {rebuild:>8.2f} {1:>7.1f}x {trees:>6} {accuracy(full, test):>9.3f}")
+            trees = len(machine.model.estimators_)
+            print(f"{size:>8} {args.added:>6} {'grow':>8} {grow:>8.2f} {rebuild / grow:>7.1f}x {trees:>6} {accuracy(machine, test):>9.3f}")
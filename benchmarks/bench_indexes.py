@@ -0,0 +1,59 @@
+"""
+Benchmark of the app's Monster queries before and after ensure_indexes():
+median latency and the winning plan (stages, keys and documents examined)
+of each query, on a scratch collection seeded with up to 1M Monsters.
+
+Needs a MongoDB server on DB_URL.
+
+    python -m benchmarks.bench_indexes [--sizes 10000 100000 1000000] [--repeat 5]
+"""
+from argparse import ArgumentParser
+from statistics import median
+from time import perf_counter
+
+from app.data import Database
+
+SIZES = (10_000, 100_000, 1_000_000)
+
+# name: (query, sort, limit), like the /data filters and pages and the lookups by Name
+QUERIES = {
+    "type": ({"Type": "Demonic"}, None, 0),
+    "type+rarity": ({"Type": "Undead", "Rarity": "Rank 1"}, None, 0),
+    "name": ({"Name": "Demonic Monster Health 150"}, None, 0),
+    "page by level": ({}, [("Level", -1), ("_id", -1)], 25),
+}
+
+
+def timed(db: Database, query, sort, limit, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = perf_counter()
+        cursor = db.collection.find(query, limit=limit)
+        if sort:
+            cursor = cursor.sort(sort)
+        list(cursor)
+        timings.append(perf_counter() - start)
+    return median(timings)
+
+
+if __name__ == '__main__':
+    parser = ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=SIZES)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    db = Database()
+    db.collection = db.db["Benchmark"]
+    print(f"{'Monsters':>10} {'query':<14} {'index':<6} {'ms':>9} {'keys':>9} {'docs':>9}  stages")
+    for amount in args.sizes:
+        db.collection.drop()
+        db.seed(amount)
+        for indexed in (False, True):
+            if indexed:
+                db.ensure_indexes()
+            for name, (query, sort, limit) in QUERIES.items():
+                ms = timed(db, query, sort, limit, args.repeat) * 1000
+                plan = db.explain(query, sort, limit)
+                print(f"{amount:>10,} {name:<14} {'yes' if indexed else 'no':<6} {ms:>9.2f} "
+                      f"{plan['keys_examined']:>9,} {plan['docs_examined']:>9,}  {' > '.join(plan['stages'])}")
+    db.collection.drop()
@@ -0,0 +1,68 @@
+"""
+Benchmark of Database.seed(): the former single-threaded path (every
+Monster in one list, one insert_many) against the streaming pipeline
+(generation across processes, concurrent unordered inserts), in docs/sec,
+up to 1M Monsters.
+
+By default inserts go to an in-memory sink that BSON encodes the batch, as
+the driver does, and waits --latency ms for the round trip, so no database
+is needed. With --live a scratch collection on DB_URL is seeded instead.
+
+    python -m benchmarks.bench_seed [--live] [--sizes 1000 100000 1000000]
+                                    [--workers N] [--latency 20]
+"""
+from argparse import ArgumentParser
+from time import perf_counter, sleep
+from types import SimpleNamespace
+
+from bson import encode
+from MonsterLab import Monster
+
+from app.data import Database
+
+SIZES = (1_000, 10_000, 100_000, 1_000_000)
+
+
+class Sink:
+    """ Stands in for the Monsters collection: encodes each batch and waits for a simulated round trip. """
+
+    def __init__(self, latency: float) -> None:
+        self.latency = latency
+
+    def insert_many(self, records, ordered=True):
+        payload = b"".join(encode(record) for record in records)
+        sleep(self.latency + len(payload) / 100e6)
+        return SimpleNamespace(acknowledged=True, inserted_ids=[None] * len(records))
+
+
+def serial(db: Database, amount: int) -> None:
+    records = [Monster().to_dict() for _ in range(amount)]
+    db.collection.insert_many(records)
+
+
+if __name__ == '__main__':
+    parser = ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--live", action="store_true")
+    parser.add_argument("--sizes", type=int, nargs="+", default=SIZES)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--latency", type=float, default=20, help="simulated round trip, in ms")
+    args = parser.parse_args()
+
+    db = Database()
+    if args.live:
+        db.collection = db.db["Benchmark"]
+    else:
+        db.collection = Sink(args.latency / 1000)
+
+    print(f"{'Monsters':>10} {'serial docs/s':>14} {'pipeline docs/s':>16} {'speedup':>8}")
+    for amount in args.sizes:
+        timings = []
+        for seed in (serial, lambda db, amount: db.seed(amount, workers=args.workers)):
+            if args.live:
+                db.collection.drop()
+            start = perf_counter()
+            seed(db, amount)
+            timings.append(perf_counter() - start)
+        print(f"{amount:>10,} {amount / timings[0]:>14,.0f} {amount / timings[1]:>16,.0f} {timings[0] / timings[1]:>7.1f}x")
+    if args.live:
+        db.collection.drop()
@@ -0,0 +1,73 @@
+"""
+Benchmark of out-of-core training: fit wall time, peak Python heap and
+holdout accuracy of the in-memory path against training on a reservoir
+sample of a chunk stream and growing the forest chunk by chunk.
+
+Time and peak memory are measured while the Monsters are produced and
+fitted, so they include the training data of each path (tracemalloc also
+traces NumPy and scikit-learn buffers). The Monsters are generated with
+MonsterLab in chunks, no database is needed.
+
+    python -m benchmarks.bench_streaming [--sizes 100000 500000] [--chunk 10000]
+                                         [--sample 100000] [--trees 100]
+"""
+from argparse import ArgumentParser
+from math import ceil
+from tempfile import TemporaryDirectory
+from time import perf_counter
+from tracemalloc import get_traced_memory, start, stop
+
+from MonsterLab import Monster
+from pandas import DataFrame, concat
+from sklearn.metrics import accuracy_score
+
+from app.machine import FEATURES, TARGET, Machine, TrainingConfig, reservoir
+
+SIZES = (100_000, 500_000)
+
+
+def monsters(amount: int) -> DataFrame:
+    return DataFrame([Monster().to_dict() for _ in range(amount)])[FEATURES + [TARGET]]
+
+
+def chunks(amount: int, size: int):
+    for offset in range(0, amount, size):
+        yield monsters(min(size, amount - offset))
+
+
+def measure(train):
+    start()
+    began = perf_counter()
+    machine = train()
+    seconds = perf_counter() - began
+    peak = get_traced_memory()[1]
+    stop()
+    return machine, seconds, peak / 2 ** 20
+
+
+if __name__ == '__main__':
+    parser = ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=SIZES)
+    parser.add_argument("--chunk", type=int, default=10_000)
+    parser.add_argument("--sample", type=int, default=100_000)
+    parser.add_argument("--trees", type=int, default=100)
+    args = parser.parse_args()
+
+    config = TrainingConfig(n_estimators=args.trees)
+    test = monsters(10_000)
+    print(f"{'rows':>8} {'mode':>7} {'fit (s)':>8} {'peak MiB':>9} {'trees':>6} {'accuracy':>9}")
+    with TemporaryDirectory() as directory:
+        filepath = f'{directory}/model.joblib'
+        for size in args.sizes:
+            trees = ceil(args.trees / ceil(size / args.chunk))
+            modes = {
+                'memory': lambda: Machine(concat(chunks(size, args.chunk)), filepath, retrain=True, config=config),
+                'sample': lambda: Machine(reservoir(chunks(size, args.chunk), args.sample), filepath, retrain=True, config=config),
+                'chunks': lambda: Machine.stream(chunks(size, args.chunk), filepath, trees=trees, config=config),
+            }
+            for mode, train in modes.items():
+                machine, seconds, peak = measure(train)
+                predicted = [machine.labels[code] for code in machine.model.predict(test[FEATURES])]
+                accuracy = accuracy_score(test[TARGET], predicted)
+                forest = len(machine.model.estimators_)
+                print(f"{size:>8} {mode:>7} {seconds:>8.2f} {peak:>9.1f} {forest:>6} {accuracy:>9.3f}")
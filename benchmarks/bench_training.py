@@ -0,0 +1,63 @@
+"""
+Benchmark of Machine training: fit wall time and holdout accuracy of the
+Random Forest against the number of cores (n_jobs) and the dataset size.
+
+The Monsters are generated with MonsterLab, no database is needed.
+
+    python -m benchmarks.bench_training [--sizes 10000 100000] [--jobs 1 2 4 -1]
+                                        [--trees 100] [--max-depth N] [--max-samples F]
+"""
+from argparse import ArgumentParser
+from os import cpu_count
+from tempfile import TemporaryDirectory
+from time import perf_counter
+
+from MonsterLab import Monster
+from pandas import DataFrame
+from sklearn.metrics import accuracy_score
+from sklearn.model_selection import train_test_split
+
+from app.machine import FEATURES, TARGET, Machine, TrainingConfig
+
+SIZES = (10_000, 100_000)
+
+
+def monsters(amount: int) -> DataFrame:
+    return DataFrame([Monster().to_dict() for _ in range(amount)])[FEATURES + [TARGET]]
+
+
+def fit(df: DataFrame, config: TrainingConfig, directory: str):
+    train, test = train_test_split(df, test_size=0.2, random_state=42, stratify=df[TARGET])
+    start = perf_counter()
+    machine = Machine(train, filepath=f'{directory}/model.joblib', retrain=True, config=config)
+    seconds = perf_counter() - start
+    predicted = [machine.labels[code] for code in machine.model.predict(test[FEATURES])]
+    return seconds, accuracy_score(test[TARGET], predicted)
+
+
+if __name__ == '__main__':
+    jobs = sorted({1, 2, 4, cpu_count() or 1})
+    parser = ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=SIZES)
+    parser.add_argument("--jobs", type=int, nargs="+", default=jobs)
+    parser.add_argument("--trees", type=int, default=100)
+    parser.add_argument("--max-depth", type=int, default=None)
+    parser.add_argument("--max-samples", type=float, default=None)
+    args = parser.parse_args()
+
+    print(f"cores: {cpu_count()}")
+    print(f"{'rows':>8} {'n_jobs':>6} {'fit (s)':>8} {'speedup':>8} {'accuracy':>9}")
+    with TemporaryDirectory() as directory:
+        for size in args.sizes:
+            df = monsters(size)
+            baseline = None
+            for n_jobs in args.jobs:
+                config = TrainingConfig(
+                    n_estimators=args.trees,
+                    max_depth=args.max_depth,
+                    max_samples=args.max_samples,
+                    n_jobs=n_jobs,
+                )
+                seconds, accuracy = fit(df, config, directory)
+                baseline = baseline or seconds
+                print(f"{size:>8} {n_jobs:>6} {seconds:>8.2f} {baseline / seconds:>7.1f}x {accuracy:>9.3f}")
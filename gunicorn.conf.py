@@ -0,0 +1,40 @@
+import logging
+import os
+
+# Import the app, and load the model, in the master process: forked workers
+# then share the model's memory pages copy-on-write instead of each loading it.
+# GUNICORN_PRELOAD=0 turns it off, which --reload needs (see run.sh): the reloader
+# restarts the workers, and workers forked from a preloaded master keep its old code.
+# The app's modules are only imported in the master when preloading, for the same reason.
+preload_app = os.getenv("GUNICORN_PRELOAD", "1") != "0"
+
+
+def when_ready(server):
+    if not server.cfg.preload_app:
+        return
+    from app.data import Database
+    from app.main import MODELS
+    # Make sure the Monsters queries are indexed, once for all the workers
+    Database().ensure_indexes()
+    try:
+        MODELS.get()
+    except Exception as error:
+        logging.warning(f"Model preload failed, workers will load it: {error}")
+
+
+def post_fork(server, worker):
+    from app.client import warm_up
+    from app.data import Database
+    # Open this worker's MongoDB pool before it accepts its first request
+    if warm_up():
+        # Without a preloaded master, each worker makes sure the indexes exist (it is idempotent)
+        if not server.cfg.preload_app:
+            Database().ensure_indexes()
+        # Track writes of the other workers to keep cached datasets fresh
+        Database().follow()
+
+
+def worker_exit(server, worker):
+    from app.client import close_clients
+    # Close this worker's MongoDB pool on shutdown
+    close_clients()
@@ -1 +1,3 @@
-python3 -m gunicorn --reload app.main:APP
\ No newline at end of file
+# Development server, restarting the workers on code changes. --reload needs the app imported
+# in each worker, not preloaded in the master (see gunicorn.conf.py), or they come back with the old code.
+GUNICORN_PRELOAD=0 python3 -m gunicorn --reload app.main:APP
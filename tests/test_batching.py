@@ -0,0 +1,51 @@
+from concurrent.futures import ThreadPoolExecutor
+from threading import Barrier
+
+import numpy as np
+import pytest
+
+from app.batching import MicroBatcher
+
+
+class EchoMachine:
+    # Predicts the Level of each row, with a confidence of 1/Level
+    feature_names = ['Level', 'Health', 'Energy', 'Sanity']
+
+    def __init__(self):
+        self.calls = 0
+
+    def predict_batch(self, basis):
+        self.calls += 1
+        levels = basis['Level'].to_numpy()
+        return levels, 1 / levels
+
+
+def test_each_caller_gets_its_own_result():
+    machine = EchoMachine()
+    batcher = MicroBatcher(lambda: machine, window=0.05, max_rows=16)
+    barrier = Barrier(16)
+
+    def predict(level):
+        barrier.wait()
+        return batcher.predict((level, 1.0, 1.0, 1.0))
+
+    with ThreadPoolExecutor(16) as pool:
+        results = list(pool.map(predict, range(1, 17)))
+
+    assert [prediction for prediction, _ in results] == list(range(1, 17))
+    assert np.allclose([confidence for _, confidence in results], [1 / level for level in range(1, 17)])
+
+    # Assert concurrent predictions were coalesced into fewer forest passes
+    assert machine.calls < 16
+    assert batcher.rows == 16
+
+
+def test_errors_reach_every_caller():
+    class BrokenMachine(EchoMachine):
+        def predict_batch(self, basis):
+            raise ValueError('no model')
+
+    batcher = MicroBatcher(BrokenMachine, window=0.001)
+
+    with pytest.raises(ValueError, match='no model'):
+        batcher.predict((1, 1.0, 1.0, 1.0))
@@ -0,0 +1,130 @@
+from unittest.mock import Mock
+
+from pandas import DataFrame
+
+from app.cache import DatasetCache, PredictionCache, SpecCache
+
+
+def monsters_db():
+    db = Mock()
+    db.version.return_value = (0, None)
+    db.dataframe.return_value = DataFrame({'Level': [1, 2], 'Rarity': ['Rank 0', 'Rank 1']})
+    return db
+
+
+def test_dataset_cache_reuses_snapshot():
+    cache = DatasetCache()
+    db = monsters_db()
+
+    first = cache.get(db, ['Level', 'Rarity'])
+    second = cache.get(db, ['Level', 'Rarity'])
+
+    # Assert the collection was loaded once and both frames hold the same data
+    db.dataframe.assert_called_once_with(columns=['Level', 'Rarity'])
+    assert first.equals(second)
+    assert cache.hits == 1 and cache.misses == 1
+
+
+def test_dataset_cache_reloads_on_new_version():
+    cache = DatasetCache()
+    db = monsters_db()
+
+    cache.get(db, ['Level', 'Rarity'])
+    db.version.return_value = (1, None)
+    cache.get(db, ['Level', 'Rarity'])
+
+    assert db.dataframe.call_count == 2
+
+
+def test_dataset_cache_snapshot_is_immutable():
+    cache = DatasetCache()
+    db = monsters_db()
+
+    df = cache.get(db, ['Level', 'Rarity'])
+    df.drop(columns=['Rarity'], inplace=True)
+    df.loc[0, 'Level'] = 99
+
+    # Assert changes to a served frame never reach the snapshot
+    again = cache.get(db, ['Level', 'Rarity'])
+    assert again.columns.to_list() == ['Level', 'Rarity']
+    assert again.loc[0, 'Level'] == 1
+
+
+def test_dataset_cache_snapshot_records_watermark():
+    cache = DatasetCache()
+    db = monsters_db()
+    calls = []
+    db.watermark.side_effect = lambda: calls.append('watermark') or 'abc'
+    db.dataframe.side_effect = lambda columns: calls.append('dataframe') or DataFrame({'Level': [1]})
+
+    _, watermark = cache.snapshot(db, ['Level'])
+    _, again = cache.snapshot(db, ['Level'])
+
+    # Assert the watermark is read before loading, and served with the cached snapshot
+    assert calls == ['watermark', 'dataframe']
+    assert watermark == again == 'abc'
+
+
+def test_prediction_cache_hits_normalized_rows():
+    cache = PredictionCache()
+    predict = Mock(return_value=(3, 0.9))
+
+    first = cache.get('v1', (4, 100.5, 20.25, 30.0), predict)
+    second = cache.get('v1', (4.0, 100.5, 20.25, 30), predict)
+
+    # Assert equal feature values share one prediction
+    predict.assert_called_once()
+    assert first == second == (3, 0.9)
+    assert cache.stats()['hit_rate'] == 0.5
+
+
+def test_prediction_cache_invalidated_by_new_version():
+    cache = PredictionCache()
+    predict = Mock(return_value=(3, 0.9))
+
+    cache.get('v1', (4, 100.5, 20.25, 30.0), predict)
+    cache.get('v2', (4, 100.5, 20.25, 30.0), predict)
+
+    assert predict.call_count == 2
+    assert cache.stats()['size'] == 1
+
+
+def test_prediction_cache_evicts_least_recently_used():
+    cache = PredictionCache(maxsize=2)
+    predict = Mock(return_value=(0, 1.0))
+
+    cache.get('v1', (1, 1, 1, 1), predict)
+    cache.get('v1', (2, 2, 2, 2), predict)
+    cache.get('v1', (1, 1, 1, 1), predict)
+    cache.get('v1', (3, 3, 3, 3), predict)
+    cache.get('v1', (1, 1, 1, 1), predict)
+
+    # Assert (2, 2, 2, 2) was evicted and (1, 1, 1, 1) kept
+    assert predict.call_count == 3
+    cache.get('v1', (2, 2, 2, 2), predict)
+    assert predict.call_count == 4
+
+
+def test_spec_cache_renders_once_per_version():
+    cache = SpecCache()
+    render = Mock(return_value='{"mark": "circle"}')
+
+    spec, etag = cache.get(('Health', 'Energy', 'Rarity'), (0, None), render)
+    again = cache.get(('Health', 'Energy', 'Rarity'), (0, None), render)
+    cache.get(('Health', 'Energy', 'Rarity'), (1, None), render)
+
+    # Assert a spec is rendered again only for a new version, with an ETag of its content
+    assert render.call_count == 2
+    assert again == (spec, etag)
+    assert SpecCache().get('other', None, render)[1] == etag
+
+
+def test_spec_cache_bounds_bytes():
+    cache = SpecCache(maxbytes=25)
+
+    for x in 'ABC':
+        cache.get(x, 0, lambda: '0123456789')
+
+    # Assert the least recently used spec was evicted to fit 25 bytes
+    assert cache.nbytes == 20
+    assert cache.warming(0) and not cache.warming(0)
@@ -1,8 +1,12 @@
 import sys
+import numpy as np
 import pytest
-from pymongo import MongoClient
+from pymongo import DeleteMany, InsertOne, MongoClient, UpdateMany
+from pymongo.errors import AutoReconnect
+from app.client import WARM_UP_TIMEOUT, warm_up
 from app.data import Database
 from os import getenv
+from time import monotonic
 from dotenv import load_dotenv
 from certifi import where
 from MonsterLab import Monster
@@ -45,6 +49,21 @@ def test_db():
 #     assert created_monster["type"] == "Dragon"
 
 
+def test_shared_client():
+    # Every Database instance of a process shares one pooled MongoClient
+    first = Database()
+    second = Database()
+
+    assert first.client is second.client
+
+
+def test_warm_up_gives_up_quickly():
+    # An unreachable server fails the warm up within WARM_UP_TIMEOUT, not the 30 s of server selection
+    start = monotonic()
+    assert not warm_up("mongodb://127.0.0.1:1/")
+    assert monotonic() - start < WARM_UP_TIMEOUT + 2
+
+
 def test_create_one_example():
     # Create an instance of the Database class
     database = Database()
@@ -205,6 +224,72 @@ def test_delete_many_undead():
     assert database.read_one(query) is None
 
 
+def test_bulk_mixed_operations():
+    database = Database()
+    operations = (InsertOne({"Name": "Bulk Monster", "Level": level}) for level in range(25))
+
+    reports = database.bulk(operations, batch_size=10)
+
+    # Assert the generator was sent in batches of 10, 10 and 5
+    assert [report["inserted"] for report in reports] == [10, 10, 5]
+    reports = database.bulk([
+        UpdateMany({"Name": "Bulk Monster", "Level": {"$lt": 5}}, {"$set": {"Level": 99}}),
+        DeleteMany({"Name": "Bulk Monster"}),
+    ], ordered=False)
+    assert reports[0]["modified"] == 5 and reports[0]["deleted"] == 25 and reports[0]["errors"] == 0
+
+
+class FlakyCollection:
+    """ Applies the first half of the first bulk_write, then fails it on a connection error. """
+
+    def __init__(self, collection):
+        self.collection = collection
+        self.attempts = 0
+
+    def __getattr__(self, name):
+        return getattr(self.collection, name)
+
+    def bulk_write(self, operations, ordered=True):
+        self.attempts += 1
+        if self.attempts == 1:
+            self.collection.bulk_write(operations[:len(operations) // 2], ordered=ordered)
+            raise AutoReconnect("connection reset")
+        return self.collection.bulk_write(operations, ordered=ordered)
+
+
+def test_bulk_resends_after_partial_apply():
+    database = Database()
+    database.delete_many({"Name": "Flaky Monster"})
+    database.collection = FlakyCollection(database.collection)
+
+    reports = database.bulk([InsertOne({"Name": "Flaky Monster", "Level": level}) for level in range(10)])
+
+    # Assert the inserts applied by the failed attempt were not inserted twice
+    assert reports[0]["attempts"] == 2 and reports[0]["inserted"] == 10 and reports[0]["errors"] == 0
+    assert database.collection.count_documents({"Name": "Flaky Monster"}) == 10
+
+    # Assert a batch that cannot be repeated safely is not resent
+    database.collection = FlakyCollection(database.collection.collection)
+    with pytest.raises(AutoReconnect):
+        database.bulk([UpdateMany({"Name": "Flaky Monster"}, {"$inc": {"Level": 1}}),
+                       DeleteMany({"Name": "Flaky Monster"})])
+    assert database.collection.attempts == 1
+    assert database.collection.count_documents({"Name": "Flaky Monster", "Level": 10}) == 1
+    database.delete_many({"Name": "Flaky Monster"})
+
+
+def test_queries_are_indexed():
+    database = Database()
+    database.ensure_indexes()
+
+    # Assert the filters and sorts the app and these tests use never scan the whole collection
+    assert not database.explain({'Type': 'Demonic'})['collscan']
+    assert not database.explain({'Name': 'Demonic Monster Health 150'})['collscan']
+    assert not database.explain({'Type': 'Undead', 'Rarity': 'Rank 1'})['collscan']
+    assert not database.explain({}, sort=[('Level', 1), ('_id', 1)], limit=25)['collscan']
+    assert database.explain({'Damage': '2d2+1'})['collscan']
+
+
 def test_seed_100():
     # Create an instance of the Database class
     database = Database()
@@ -242,6 +327,18 @@ def test_seed_1000():
     # Assert that 10 new monsters have been added to the database (the overall count has increased 10?)
 
 
+def test_seed_batches():
+    database = Database()
+    before = database.collection.count_documents({})
+    progress = []
+
+    assert database.seed(2500, batch_size=1000, workers=0, progress=lambda inserted, seconds: progress.append(inserted))
+
+    # Assert every batch was inserted, and reported once
+    assert database.collection.count_documents({}) == before + 2500
+    assert sorted(progress) == progress and progress[-1] == 2500 and len(progress) == 3
+
+
 def test_reset_delete_all():
     # Create an instance of the Database class
     database = Database()
@@ -258,6 +355,22 @@ def test_count():
     database = Database()
 
     print(database.count())
+    assert database.count() == database.collection.count_documents({})
+
+
+def test_count_follows_writes():
+    database = Database()
+    before = database.count()
+
+    # Assert the cached count moves with the writes of this process
+    database.create_many([Monster().to_dict() for _ in range(10)])
+    assert database.count() == before + 10
+    database.create_one()
+    database.delete_one({})
+    assert database.count() == before + 10 == database.collection.count_documents({})
+
+    # Assert filtered counts are counted by the server
+    assert database.count({"Type": "Demonic"}) == database.collection.count_documents({"Type": "Demonic"})
 
 
 def test_dataframe():
@@ -271,6 +384,31 @@ def test_dataframe():
     assert df.shape[0] == database.count()
 
 
+def test_dataframe_columns():
+    database = Database()
+
+    df = database.dataframe(columns=['Level', 'Health', 'Rarity'], limit=10)
+    print(df.dtypes)
+
+    # Assert only the projected columns are loaded, with the default dtype hints
+    assert df.columns.to_list() == ['Level', 'Health', 'Rarity']
+    assert df.shape[0] <= 10
+    assert str(df['Health'].dtype) == 'float32'
+    assert str(df['Rarity'].dtype) == 'category'
+
+
+def test_dataframe_all_fields():
+    database = Database()
+    database.create_one({**Monster().to_dict(), 'Level': 'not a number', 'Nickname': 'Bob'})
+
+    df = database.dataframe(query={'Nickname': 'Bob'})
+
+    # Assert all fields are loaded as stored, including fields and values outside SCHEMA
+    assert 'Nickname' in df.columns
+    assert df['Level'].to_list()[-1] == 'not a number'
+    database.delete_many({'Nickname': 'Bob'})
+
+
 def test_dataframe_export_csv():
     database = Database()
 
@@ -285,6 +423,48 @@ def test_dataframe_export_csv():
     assert df.shape[0] == database.count()
 
 
+def test_groups():
+    database = Database()
+    database.seed(100)
+    df = database.dataframe()
+
+    # Assert the server side counts and means match pandas on the whole collection
+    groups = database.groups("Rarity")
+    expected = df.groupby("Rarity", observed=True)["Health"].agg(["size", "mean"])
+    assert [group["Rarity"] for group in groups] == list(expected.index)
+    assert [group["count"] for group in groups] == list(expected["size"])
+    assert np.allclose([group["Health"] for group in groups], expected["mean"], rtol=1e-5)
+
+
+def test_histogram():
+    database = Database()
+    database.seed(100)
+
+    histogram = database.histogram("Health", bins=8)
+
+    # Assert every Monster falls in exactly one bin, the maximum included
+    assert len(histogram["bins"]) == 8
+    assert sum(bin["count"] for bin in histogram["bins"]) == database.count()
+    assert histogram["other"] == 0
+
+    with pytest.raises(ValueError):
+        database.histogram("Damage")
+
+
+def test_summary():
+    database = Database()
+    database.seed(100)
+    health = database.dataframe(columns=["Health"])["Health"]
+
+    summary = database.summary(["Health"])
+    assert summary["count"] == len(health)
+    assert np.isclose(summary["Health"]["mean"], health.mean(), rtol=1e-5)
+    assert np.isclose(summary["Health"]["std"], health.std(ddof=0), rtol=1e-4)
+    assert database.summary(query={"Type": "No such Type"}) == {
+        "count": 0, "Level": None, "Health": None, "Energy": None, "Sanity": None,
+    }
+
+
 def test_html_table():
     database = Database()
 
@@ -295,3 +475,35 @@ def test_html_table():
     print(table_string)
 
     assert table_string[1:6] == 'table'
+
+
+def test_page():
+    database = Database()
+
+    first = database.page(sort='Level', limit=10)
+    print(first['records'])
+
+    # Assert a page holds at most limit Monsters, and the next page does not repeat them
+    assert len(first['records']) <= 10
+    if first['next']:
+        second = database.page(sort='Level', limit=10, after=first['next'])
+        assert second['prev'] is not None
+        assert not [record for record in second['records'] if record in first['records']]
+
+
+def test_page_invalid_sort():
+    database = Database()
+
+    with pytest.raises(ValueError):
+        database.page(sort='Damage')
+
+
+def test_since_watermark():
+    database = Database()
+    watermark = database.watermark()
+
+    # Assert nothing is newer than the newest Monster, until a new one is inserted
+    assert database.read_one(database.since(watermark)) is None
+    database.create_one(Monster().to_dict())
+    assert database.read_one(database.since(watermark)) is not None
+    assert Database.since(None) == {}
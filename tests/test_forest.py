@@ -0,0 +1,49 @@
+import os
+
+import numpy as np
+from pandas import read_csv
+from sklearn.ensemble import ExtraTreesClassifier, RandomForestClassifier
+
+from app.forest import FlatForest
+
+FEATURES = ['Level', 'Health', 'Energy', 'Sanity']
+
+
+def monsters():
+    return read_csv(os.path.join(os.path.dirname(__file__), 'monsters.csv'))
+
+
+def random_rows(amount):
+    generator = np.random.default_rng(42)
+    levels = generator.integers(1, 21, amount)
+    stats = generator.uniform(1, 250, (amount, 3)).round(2)
+    return np.column_stack([levels, stats])
+
+
+'''
+Does the flattened forest give the same probabilities as scikit-learn's predict_proba()?
+'''
+def test_flat_forest_matches_predict_proba():
+    df = monsters()
+    rows = np.vstack([df[FEATURES].to_numpy()[:200], random_rows(200)])
+
+    for estimator in (RandomForestClassifier(n_estimators=25, random_state=42),
+                      ExtraTreesClassifier(n_estimators=25, random_state=42)):
+        model = estimator.fit(df[FEATURES], df['Rarity'])
+        forest = FlatForest.from_estimator(model)
+
+        expected = model.predict_proba(rows)
+        actual = np.array([forest.predict_proba(tuple(row)) for row in rows])
+
+        assert np.allclose(actual, expected, rtol=0, atol=1e-12)
+
+
+def test_flat_forest_prediction():
+    df = monsters()
+    model = RandomForestClassifier(n_estimators=25, random_state=42).fit(df[FEATURES], df['Rarity'])
+    forest = FlatForest.from_estimator(model)
+
+    for row in random_rows(50):
+        prediction, confidence = forest(tuple(row))
+        assert prediction == model.predict(row.reshape(1, -1))[0]
+        assert np.isclose(confidence, model.predict_proba(row.reshape(1, -1)).max())
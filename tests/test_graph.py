@@ -6,9 +6,12 @@ from os import getenv
 from dotenv import load_dotenv
 from certifi import where
 from MonsterLab import Monster
-from app.graph import chart
-from pandas import DataFrame
+from app.graph import chart, chart_csv, chart_data, chart_query
+from pandas import DataFrame, read_csv
 import altair as alt
+from gzip import decompress
+from io import BytesIO
+import numpy as np
 
 print(sys.path)
 
@@ -80,3 +83,51 @@ def test_chart_serialization():
     # assert original_chart.encoding.y.shorthand == deserialized_chart.encoding.y.field
     # assert original_chart.encoding.color.shorthand == deserialized_chart.encoding.color.field
 
+
+def monsters(rows):
+    # Many Monsters, with a rare Rarity
+    rng = np.random.default_rng(0)
+    return DataFrame({
+        'Level': rng.integers(1, 21, rows),
+        'Health': rng.uniform(1, 250, rows),
+        'Energy': rng.uniform(1, 250, rows),
+        'Rarity': rng.choice(['Rank 0', 'Rank 1', 'Rank 5'], rows, p=[0.6, 0.395, 0.005]),
+    })
+
+def test_chart_sample_is_stratified():
+    df = monsters(50_000)
+
+    data = chart_data(df, 'Health', 'Energy', 'Rarity', mode='sample', threshold=1000)
+
+    # Assert the sample has threshold rows, and every Rarity keeps about its share
+    assert len(data) == 1000
+    shares = data['Rarity'].value_counts(normalize=True)
+    assert abs(shares['Rank 0'] - 0.6) < 0.02 and shares['Rank 5'] > 0
+
+def test_chart_bin_has_fixed_size():
+    small = chart(monsters(10_000), 'Health', 'Energy', 'Rarity', mode='bin', threshold=1000, bins=20)
+    large = chart(monsters(100_000), 'Health', 'Energy', 'Rarity', mode='bin', threshold=1000, bins=20)
+
+    # Assert the spec holds at most one circle per cell, whatever the number of Monsters
+    assert len(large.data) <= 20 * 20
+    assert len(large.to_json()) < 1.1 * len(small.to_json())
+    assert large.data['Count'].sum() == 100_000
+    assert len(chart_data(monsters(10_000), 'Level', 'Rarity', 'Energy', mode='bin', threshold=1000)) <= 20 * 3
+
+def test_chart_loads_data_from_url():
+    df = monsters(10_000)
+
+    spec = chart(df, 'Health', 'Energy', 'Rarity', threshold=1000, url='view/data?target=Rarity').to_dict()
+    rows = read_csv(BytesIO(decompress(chart_csv(df, 'Health', 'Energy', 'Rarity', threshold=1000))))
+
+    # Assert the spec carries no rows, and the endpoint serves the sample it encodes
+    assert spec['data']['url'] == 'view/data?target=Rarity'
+    assert 'datasets' not in spec
+    assert rows.columns.to_list() == df.columns.to_list() and len(rows) == 1000
+    assert chart_csv(df, 'Health', 'Energy', 'Rarity', threshold=1000) == chart_csv(df, 'Level', 'Energy', 'Rarity', threshold=1000)
+
+def test_chart_query():
+    # Charts share their data unless it depends on their options
+    assert chart_query(100, 'Health', 'Energy', 'Rarity', mode='sample', threshold=1000) == {}
+    assert chart_query(10_000, 'Health', 'Energy', 'Rarity', mode='sample', threshold=1000) == {'target': 'Rarity'}
+    assert len(chart_query(10_000, 'Health', 'Energy', 'Rarity', mode='bin', threshold=1000)) == 3
@@ -0,0 +1,68 @@
+from threading import Event
+
+from app.jobs import TrainingJobs
+
+
+def test_job_runs_in_background():
+    jobs = TrainingJobs()
+    release = Event()
+    finished = Event()
+
+    def train():
+        release.wait(5)
+        finished.set()
+
+    job_id = jobs.submit(train)
+
+    # Assert submit returned before training finished
+    assert jobs.status(job_id)['status'] in ('queued', 'running')
+    release.set()
+    assert finished.wait(5)
+    jobs._executor.shutdown(wait=True)
+    assert jobs.status(job_id)['status'] == 'done'
+    assert jobs.active() is None
+
+
+def test_one_job_at_a_time():
+    jobs = TrainingJobs()
+    release = Event()
+
+    first = jobs.submit(lambda: release.wait(5))
+    second = jobs.submit(lambda: None)
+
+    # Assert a second retrain joins the active one
+    assert first == second
+    release.set()
+
+
+def test_failed_job():
+    jobs = TrainingJobs()
+
+    def train():
+        raise ValueError('no data')
+
+    job_id = jobs.submit(train)
+    jobs._executor.shutdown(wait=True)
+
+    job = jobs.status(job_id)
+    assert job['status'] == 'failed'
+    assert job['error'] == 'no data'
+    assert jobs.status('unknown') is None
+
+
+def test_jobs_shared_between_processes(tmp_path):
+    # Two registries on one directory stand in for two gunicorn workers
+    first, second = TrainingJobs(str(tmp_path)), TrainingJobs(str(tmp_path))
+    release = Event()
+
+    job_id = first.submit(lambda: release.wait(5))
+
+    # Assert the other worker joins the running job, and can poll it
+    assert second.submit(lambda: None) == job_id
+    assert second.active() == job_id
+    assert second.status(job_id)['status'] in ('queued', 'running')
+    release.set()
+    first._executor.shutdown(wait=True)
+    assert second.status(job_id)['status'] == 'done'
+    assert second.active() is None
+    assert second.submit(lambda: None) != job_id
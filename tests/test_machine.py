@@ -1,14 +1,14 @@
 import sys
 import pytest
 from app.data import Database
-from app.machine import Machine
+from app.machine import Machine, TrainingConfig, reservoir
 from joblib import load, dump
 import os
 from flask import Flask, render_template, request
 from Fortuna import random_int, random_float
 from unittest.mock import Mock, patch
 import numpy as np
-from pandas import DataFrame
+from pandas import DataFrame, concat, read_csv
 
 
 print(sys.path)
@@ -199,3 +199,166 @@ def test_home_page(client):
     response = client.get('/')
     print(response.data)
     #assert response.data == b'Hello, Flask!'
+
+
+'''
+Does a Machine load from the model file alone, with the feature schema, 
+labels and training metadata it was trained with?
+'''
+def test_machine_from_artifact(tmp_path):
+    df = read_csv(os.path.join(os.path.dirname(__file__), 'monsters.csv'))
+    filepath = str(tmp_path / 'model.joblib')
+
+    trained = Machine(df, filepath=filepath)
+    loaded = Machine(filepath=filepath)
+
+    assert loaded.target is None and loaded.features is None
+    assert loaded.feature_names == ['Level', 'Health', 'Energy', 'Sanity']
+    assert loaded.labels == ['Rank 0', 'Rank 1', 'Rank 2', 'Rank 3', 'Rank 4', 'Rank 5']
+    assert loaded.rows == len(df)
+    assert loaded.timestamp == trained.timestamp
+
+    prediction, confidence = loaded(df.head(1))
+    assert loaded.labels[prediction] in loaded.labels
+    assert 0 < confidence <= 1
+
+
+def test_machine_without_artifact_or_data(tmp_path):
+    with pytest.raises(FileNotFoundError):
+        Machine(filepath=str(tmp_path / 'missing.joblib'))
+
+
+def test_save_keeps_file_mode(tmp_path):
+    df = read_csv(os.path.join(os.path.dirname(__file__), 'monsters.csv'))
+    filepath = str(tmp_path / 'model.joblib')
+    machine = Machine(df, filepath=filepath, config=TrainingConfig(n_estimators=5))
+
+    # Assert a new file is readable by all, and a replaced one keeps its permissions
+    assert os.stat(filepath).st_mode & 0o777 == 0o644
+    os.chmod(filepath, 0o640)
+    machine.save(filepath)
+    assert os.stat(filepath).st_mode & 0o777 == 0o640
+
+
+'''
+Does the training config set the forest budget, and is it stored with the model?
+'''
+def test_training_config(tmp_path, monkeypatch):
+    monkeypatch.setenv('MODEL_N_ESTIMATORS', '10')
+    monkeypatch.setenv('MODEL_MAX_DEPTH', '6')
+    config = TrainingConfig.from_env()
+    assert config.n_estimators == 10 and config.max_depth == 6 and config.n_jobs == -1
+
+    df = read_csv(os.path.join(os.path.dirname(__file__), 'monsters.csv'))
+    filepath = str(tmp_path / 'model.joblib')
+    Machine(df, filepath=filepath, config=config)
+    machine = Machine(filepath=filepath)
+
+    assert len(machine.model.estimators_) == 10
+    assert machine.model.n_jobs is None
+    assert machine.config == config
+
+
+'''
+Is the model file versioned, compressible, and are earlier layouts still readable?
+'''
+def test_artifact_format(tmp_path):
+    df = read_csv(os.path.join(os.path.dirname(__file__), 'monsters.csv'))
+    filepath = str(tmp_path / 'model.joblib')
+    machine = Machine(df, filepath=filepath, config=TrainingConfig(n_estimators=10), data_version='v1')
+    plain = os.path.getsize(filepath)
+
+    machine.save(filepath, compress=3)
+    artifact = Machine.artifact(filepath, mmap_mode='r')
+
+    assert os.path.getsize(filepath) < plain
+    assert artifact['format'] == 2
+    assert artifact['meta']['data_version'] == 'v1'
+    assert artifact['meta']['labels'] == machine.labels
+
+    # A bare estimator, as saved by earlier versions
+    dump(machine.model, filepath)
+    legacy = Machine(filepath=filepath)
+    assert legacy.feature_names == ['Level', 'Health', 'Energy', 'Sanity']
+    assert Machine.artifact(filepath)['format'] == 0
+
+
+'''
+Does predict_batch() agree with the forest's predict() and predict_proba() in a single pass?
+'''
+def test_predict_batch(tmp_path):
+    df = read_csv(os.path.join(os.path.dirname(__file__), 'monsters.csv'))
+    machine = Machine(df, filepath=str(tmp_path / 'model.joblib'), config=TrainingConfig(n_estimators=10))
+    basis = df[['Level', 'Health', 'Energy', 'Sanity']].head(100)
+
+    predictions, confidences = machine.predict_batch(basis)
+
+    assert np.array_equal(predictions, machine.model.predict(basis))
+    assert np.allclose(confidences, machine.model.predict_proba(basis).max(axis=1))
+    assert machine(basis.head(1)) == (predictions[0], confidences[0])
+
+
+'''
+Does grow() add trees fitted on the new rows only, and refuse rows it cannot learn incrementally?
+'''
+def test_grow(tmp_path):
+    df = read_csv(os.path.join(os.path.dirname(__file__), 'monsters.csv'))
+    old, new = df.iloc[:len(df) // 2], df.iloc[len(df) // 2:]
+    filepath = str(tmp_path / 'model.joblib')
+    Machine(old, filepath=filepath, config=TrainingConfig(n_estimators=10), watermark='a' * 24)
+    machine = Machine(filepath=filepath)
+    trees = machine.model.estimators_[:]
+
+    assert machine.watermark == 'a' * 24
+    assert machine.grow(new, watermark='b' * 24)
+    assert machine.model.estimators_[:10] == trees
+    assert len(machine.model.estimators_) == 10 + round(10 * len(new) / len(old))
+    assert machine.rows == len(df) and machine.watermark == 'b' * 24
+    assert not machine.model.warm_start
+
+    # New rows missing a label would change the forest's classes
+    assert not machine.grow(new[new['Rarity'] != 'Rank 5'])
+    assert machine.rows == len(df)
+
+
+'''
+Does a Machine train one chunk at a time, and does the reservoir keep a uniform sample of a stream?
+'''
+def test_stream(tmp_path):
+    df = read_csv(os.path.join(os.path.dirname(__file__), 'monsters.csv'))
+    chunks = (df.iloc[i:i + 1000] for i in range(0, 4000, 1000))
+    filepath = str(tmp_path / 'model.joblib')
+
+    machine = Machine.stream(chunks, filepath=filepath, trees=5, config=TrainingConfig(n_estimators=10))
+
+    assert len(machine.model.estimators_) == 20
+    assert machine.rows == 4000 and machine.features is None
+    assert Machine(filepath=filepath).config.n_estimators == 10
+
+
+def test_stream_labels_from_every_chunk(tmp_path):
+    df = read_csv(os.path.join(os.path.dirname(__file__), 'monsters.csv'))
+    rare = df['Rarity'] == 'Rank 5'
+    # The rarest label only shows up in the last chunk
+    ordered = concat([df[~rare], df[rare]], ignore_index=True)
+    chunks = (ordered.iloc[i:i + 1000] for i in range(0, len(ordered), 1000))
+    filepath = str(tmp_path / 'model.joblib')
+
+    machine = Machine.stream(chunks, filepath=filepath, trees=5, config=TrainingConfig(n_estimators=10),
+                             labels=df['Rarity'].unique(), carry=600)
+
+    # Assert the label is learned, and the rows carried over until then were capped
+    assert machine.labels == sorted(df['Rarity'].unique())
+    assert 600 <= machine.rows < len(df)
+
+
+def test_reservoir():
+    df = DataFrame({'Level': range(1000)})
+    chunks = (df.iloc[i:i + 64] for i in range(0, 1000, 64))
+
+    sample = reservoir(chunks, 100, random_state=1)
+
+    assert len(sample) == 100 and sample['Level'].is_unique
+    # Assert the sample is drawn from the whole stream, not its first rows
+    assert sample['Level'].max() > 500
+    assert len(reservoir([df.head(10)], 100)) == 10
@@ -0,0 +1,63 @@
+import os
+from unittest.mock import Mock
+
+from app.registry import ModelRegistry
+
+
+def test_registry_loads_once(tmp_path):
+    filepath = tmp_path / 'model.joblib'
+    filepath.write_bytes(b'model one')
+    factory = Mock(side_effect=lambda: object())
+    registry = ModelRegistry(str(filepath), factory, interval=0)
+
+    first = registry.get()
+    second = registry.get()
+
+    # Assert the artifact was loaded once and the same Machine is shared
+    assert factory.call_count == 1
+    assert first is second
+    assert registry.version is not None
+
+
+def test_registry_hot_reloads_changed_artifact(tmp_path):
+    filepath = tmp_path / 'model.joblib'
+    filepath.write_bytes(b'model one')
+    factory = Mock(side_effect=lambda: object())
+    registry = ModelRegistry(str(filepath), factory, interval=0)
+    first = registry.get()
+    version = registry.version
+
+    filepath.write_bytes(b'model two, retrained')
+    second = registry.get()
+
+    assert factory.call_count == 2
+    assert first is not second
+    assert registry.version != version
+
+
+def test_registry_ignores_touched_artifact(tmp_path):
+    filepath = tmp_path / 'model.joblib'
+    filepath.write_bytes(b'model one')
+    factory = Mock(side_effect=lambda: object())
+    registry = ModelRegistry(str(filepath), factory, interval=0)
+    registry.get()
+
+    # Same content, new mtime
+    os.utime(filepath, ns=(0, 0))
+    registry.get()
+
+    assert factory.call_count == 1
+
+
+def test_registry_current_pairs_machine_and_version(tmp_path):
+    filepath = tmp_path / 'model.joblib'
+    filepath.write_bytes(b'model one')
+    registry = ModelRegistry(str(filepath), Mock(side_effect=lambda: object()), interval=0)
+    first, first_version = registry.current()
+
+    # Assert a published Machine is handed out with its own version
+    filepath.write_bytes(b'model two, retrained')
+    published = object()
+    registry.publish(published)
+    machine, version = registry.current()
+    assert machine is published and version == registry.version != first_version
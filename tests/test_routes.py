@@ -0,0 +1,82 @@
+import gzip
+import json
+from unittest.mock import Mock
+
+import pytest
+from pandas import DataFrame
+
+import app.main as main
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(main, "BATCH_SIZE", 2)
+    main.APP.config['TESTING'] = True
+    with main.APP.test_client() as client:
+        yield client
+
+
+MONSTER = {"Level": 3, "Health": 20.5, "Energy": 11.0, "Sanity": 7.25}
+
+
+def test_model_batch_json(client):
+    response = client.post('/model/batch', json=[MONSTER] * 5)
+
+    lines = [json.loads(line) for line in response.data.splitlines()]
+    assert response.status_code == 200
+    assert len(lines) == 5 and all(line["Rarity"].startswith("Rank") for line in lines)
+
+
+def test_model_batch_rejects_bad_json(client):
+    # Assert a missing feature, or a value that is not a number, is rejected before streaming, in any batch
+    assert client.post('/model/batch', json=[MONSTER] * 3 + [{"Level": 1}]).status_code == 400
+    assert client.post('/model/batch', json=[MONSTER] * 3 + [{**MONSTER, "Level": "x"}]).status_code == 400
+    assert client.post('/model/batch', json=[MONSTER, 3]).status_code == 400
+
+
+def test_model_batch_rejects_bad_csv(client):
+    def post(body):
+        return client.post('/model/batch', data=body, content_type='text/csv')
+
+    assert post('').status_code == 400
+    assert post('Level,Health,Energy,Sanity\n1,2,3,4,5,6\n"x\n').status_code == 400
+    assert post('Level,Health\n1,2\n').status_code == 400
+    assert post('Level,Health,Energy,Sanity\nx,2,3,4\n').status_code == 400
+
+
+def test_model_batch_csv_ends_with_error_line(client):
+    body = 'Level,Health,Energy,Sanity\n' + '1,2,3,4\n' * 3 + 'x,2,3,4\n'
+
+    response = client.post('/model/batch', data=body, content_type='text/csv')
+    lines = response.data.decode().splitlines()
+
+    # Assert the scored chunks are kept, and the chunk that cannot be scored ends the stream with an error
+    assert response.status_code == 200
+    assert len(lines) == 1 + 2 + 1 and lines[-1].startswith('# error: Monsters 2 and after')
+
+
+@pytest.fixture
+def view_db(monkeypatch):
+    db = Mock()
+    db.version.return_value = ('test', object())
+    db.watermark.return_value = None
+    db.dataframe.return_value = DataFrame({
+        'Level': [1, 2, 3], 'Health': [1.5, 2.5, 3.5], 'Energy': [4.0, 5.0, 6.0],
+        'Sanity': [7.0, 8.0, 9.0], 'Rarity': ['Rank 0', 'Rank 1', 'Rank 0'],
+    })
+    monkeypatch.setattr(main, 'Database', lambda: db)
+    return db
+
+
+def test_view_data_negotiates_gzip(client, view_db):
+    compressed = client.get('/view/data', headers={'Accept-Encoding': 'gzip, deflate'})
+    plain = client.get('/view/data', headers={'Accept-Encoding': 'identity'})
+
+    # Assert gzip is only sent to clients accepting it, each representation with its own ETag
+    assert compressed.headers['Content-Encoding'] == 'gzip'
+    assert 'Content-Encoding' not in plain.headers
+    assert gzip.decompress(compressed.data) == plain.data
+    assert plain.data.splitlines()[0] == b'Level,Health,Energy,Sanity,Rarity'
+    assert compressed.headers['ETag'] != plain.headers['ETag']
+    assert compressed.headers['Vary'] == plain.headers['Vary'] == 'Accept-Encoding'
+    assert client.get('/view/data', headers={'If-None-Match': plain.headers['ETag']}).status_code == 304
@@ -0,0 +1,39 @@
+import os
+
+from pandas import read_csv
+
+from app.machine import Machine, TrainingConfig
+from app.selection import candidates, select
+
+
+def test_candidates():
+    configs = candidates(base=TrainingConfig(n_jobs=2))
+
+    assert len(configs) == 10
+    assert {config.family for config in configs} == {'random_forest', 'extra_trees', 'gradient_boosting'}
+    assert all(config.n_jobs == 2 for config in configs)
+
+
+def test_select_promotes_winner(tmp_path):
+    df = read_csv(os.path.join(os.path.dirname(__file__), 'monsters.csv'))
+    configs = [
+        TrainingConfig(n_estimators=10, family='random_forest'),
+        TrainingConfig(n_estimators=10, family='extra_trees'),
+        TrainingConfig(max_depth=1, family='random_forest', n_estimators=2),
+    ]
+
+    result = select(df, configs, folds=3, workers=2)
+    summary = result['selection']
+
+    # Assert the stump lost and was dropped before the last fold, while the winner ran every fold
+    assert result['config'] in configs[:2]
+    assert summary['folds'] == 3 and summary['candidates'] == 3
+    assert summary['rounds'][2] == 1
+    assert sorted(summary['rounds']) == [1, 2, 3]
+    assert 0.5 < summary['score'] <= 1
+
+    filepath = str(tmp_path / 'model.joblib')
+    Machine(df, filepath=filepath, config=result['config'], selection=summary)
+    loaded = Machine(filepath=filepath)
+    assert loaded.config.family == result['config'].family
+    assert 'Selected' in loaded.info()